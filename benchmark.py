@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Headless: no window, no audio device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+import main
+from main import Action, Config, Game, GameState, PowerUpType, Simulation, Starfield
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# A scenario is (config overrides, setup(game), per-frame hook(game)); hooks run
+# before each Game.update so the stress condition holds for every frame.
+
+
+def setup_menu(game):
+    game.state = GameState.MENU
+
+
+def setup_playing(game):
+    game.state = GameState.PLAYING
+
+
+def keep_alive(game):
+    # Nothing in a benchmark should end the run
+    game.sim.lives = Config.LIVES
+    game.player.activate_power(PowerUpType.SHIELD, Config.SHIELD_DURATION)
+
+
+def magnet_hook(game):
+    keep_alive(game)
+    game.player.activate_power(PowerUpType.MAGNET, Config.MAGNET_DURATION)
+
+
+def shake_hook(game):
+    keep_alive(game)
+    game.shake_amount = 10
+
+
+def explosion_hook(game):
+    # Collect every live block each frame so every one of them bursts
+    keep_alive(game)
+    sim = game.sim
+    blocks = sim.blocks
+    sim.events = []
+    for row in np.flatnonzero(blocks.active[:blocks.count]).tolist():
+        sim.collect(row)
+    for event in sim.events:
+        game.handle_sim_event(event)
+
+
+SCENARIOS = {
+    "idle_menu": ({}, setup_menu, None),
+    "max_blocks_magnet": ({"MAX_BLOCKS": 200, "BLOCK_SPAWN_RATE": 1.0}, setup_playing, magnet_hook),
+    "continuous_shake": ({}, setup_playing, shake_hook),
+    "explosion_storm": ({"MAX_BLOCKS": 60, "BLOCK_SPAWN_RATE": 1.0}, setup_playing, explosion_hook),
+    "huge_window": ({"WIDTH": 3840, "HEIGHT": 2160}, setup_playing, keep_alive),
+    # The same stress at the lowest quality level the governor falls back to
+    "explosion_storm_low": ({"MAX_BLOCKS": 60, "BLOCK_SPAWN_RATE": 1.0, "QUALITY": "low"},
+                            setup_playing, explosion_hook),
+    "huge_window_low": ({"WIDTH": 3840, "HEIGHT": 2160, "QUALITY": "low"}, setup_playing, keep_alive),
+}
+
+# Simulation.step alone, config overrides only: the rules without drawing or
+# effects, whose cost a whole frame would hide
+SIM_SCENARIOS = {
+    "sim_default_density": {},
+    "sim_dense": {"MAX_BLOCKS": 200, "BLOCK_SPAWN_RATE": 1.0},
+}
+SIM_PASSES = 10  # Timed passes over the same ticks, the fastest counts
+
+# Higher is better for these, lower for everything else
+HIGHER_IS_BETTER = {"ticks_per_sec", "fps"}
+GATED_METRICS = ("ticks_per_sec", "fps", "frame_p95_ms", "surfaces_per_frame", "alloc_kb_per_frame")
+# Deterministic for a given seed, frames and warmup, so compared only when those match
+RUN_DEPENDENT = {"surfaces_per_frame", "alloc_kb_per_frame"}
+
+
+class CountingSurface(pygame.Surface):
+    # Stands in for pygame.Surface inside main to count surface allocations
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingSurface.created += 1
+
+
+def make_game(seed):
+    random.seed(seed)
+    game = Game()
+    game.particles.rng = np.random.default_rng(seed)
+    game.starfield = Starfield(Config.WIDTH, Config.HEIGHT, np.random.default_rng(seed))
+    game.apply_quality()
+    return game
+
+
+def frame(game, hook):
+    if hook is not None:
+        hook(game)
+    start = time.perf_counter()
+    game.update()
+    middle = time.perf_counter()
+    game.draw(1.0)
+    end = time.perf_counter()
+    return middle - start, end - middle
+
+
+def run_scenario(name, frames, warmup, seed):
+    overrides, setup, hook = SCENARIOS[name]
+    saved = {key: getattr(Config, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(Config, key, value)
+    try:
+        game = make_game(seed)
+        setup(game)
+        for _ in range(warmup):
+            frame(game, hook)
+
+        update_times = np.zeros(frames)
+        draw_times = np.zeros(frames)
+        for i in range(frames):
+            update_times[i], draw_times[i] = frame(game, hook)
+
+        # Allocation pass, separate because tracing slows everything down
+        alloc_frames = max(1, frames // 10)
+        CountingSurface.created = 0
+        main.pygame.Surface = CountingSurface
+        tracemalloc.start()
+        try:
+            peaks = []
+            for _ in range(alloc_frames):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                frame(game, hook)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+            main.pygame.Surface = CountingSurface.__base__
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+    frame_ms = (update_times + draw_times) * 1000
+    p50, p95, p99 = np.percentile(frame_ms, (50, 95, 99))
+    return {
+        "frames": frames,
+        "warmup": warmup,
+        "seed": seed,
+        "ticks_per_sec": float(frames / update_times.sum()),
+        "fps": float(frames / (update_times + draw_times).sum()),
+        "update_mean_ms": float(update_times.mean() * 1000),
+        "draw_mean_ms": float(draw_times.mean() * 1000),
+        "frame_p50_ms": float(p50),
+        "frame_p95_ms": float(p95),
+        "frame_p99_ms": float(p99),
+        "surfaces_per_frame": CountingSurface.created / alloc_frames,
+        "alloc_kb_per_frame": float(np.mean(peaks) / 1024),
+        "blocks": int(game.sim.blocks.count),
+        "particles": int(game.particles.count),
+    }
+
+
+def run_sim_scenario(name, frames, warmup, seed):
+    # One tick per frame, the player sweeping left and right; each pass restarts
+    # from the same snapshot so every pass does identical work
+    overrides = SIM_SCENARIOS[name]
+    saved = {key: getattr(Config, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(Config, key, value)
+    try:
+        sim = Simulation()
+        sim.reset(seed)
+        actions = (Action.LEFT, Action.STOP, Action.RIGHT)
+
+        def run(ticks):
+            for tick in range(ticks):
+                sim.player.activate_power(PowerUpType.SHIELD, Config.SHIELD_DURATION)
+                sim.step(actions[tick // 30 % 3])
+
+        run(warmup)
+        start = sim.snapshot()
+        best = float("inf")
+        for _ in range(SIM_PASSES):
+            sim.restore(start)
+            begin = time.perf_counter()
+            run(frames)
+            best = min(best, time.perf_counter() - begin)
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+    return {
+        "frames": frames,
+        "warmup": warmup,
+        "seed": seed,
+        "ticks_per_sec": float(frames / best),
+        "blocks": int(sim.blocks.count),
+    }
+
+
+def startup_probe(atlas, seed):
+    # Runs in a fresh process, so fonts and caches start cold: time to build the
+    # game and draw its first frame, then to play the first two seconds, which is
+    # where sprites not in the atlas are rasterized
+    Config.SPRITE_ATLAS = atlas or None
+    random.seed(seed)
+    start = time.perf_counter()
+    game = Game()
+    game.draw(1.0)
+    first_frame = time.perf_counter()
+    game.reset_game(seed)
+    setup_playing(game)
+    worst = max(sum(frame(game, keep_alive)) for _ in range(2 * Config.TICK_RATE))
+    end = time.perf_counter()
+    game.close()
+    return {
+        "first_frame_ms": (first_frame - start) * 1000,
+        "first_seconds_ms": (end - first_frame) * 1000,
+        "worst_frame_ms": worst * 1000,
+        "sprites_rasterized": game.sprites.misses + game.particles.sprites.misses,
+        "atlas_frames": len(game.sprites.atlas) + len(game.particles.sprites.atlas),
+    }
+
+
+def measure_startup(runs, atlas, seed):
+    # Median of runs fresh processes, drawing everything at runtime and with the atlas
+    results = {}
+    for name, path in (("runtime", ""), ("atlas", atlas)):
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, __file__, "--startup-probe", path, "--seed", str(seed)],
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.splitlines()[-1]))
+        results[name] = {key: float(np.median([sample[key] for sample in samples])) for key in samples[0]}
+        metrics = results[name]
+        print(f"{name:<8} first frame {metrics['first_frame_ms']:7.1f} ms  "
+              f"first 2 s of play {metrics['first_seconds_ms']:7.1f} ms (worst frame {metrics['worst_frame_ms']:5.1f})  "
+              f"{metrics['sprites_rasterized']:5.0f} sprites rasterized  {metrics['atlas_frames']:5.0f} from atlas")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Returns a list of human-readable regressions
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        same_run = all(reference.get(key) == metrics[key] for key in ("frames", "warmup", "seed"))
+        for metric in GATED_METRICS:
+            if metric not in reference or (metric in RUN_DEPENDENT and not same_run):
+                continue
+            value, expected = metrics[metric], reference[metric]
+            if metric in HIGHER_IS_BETTER:
+                failed = value < expected * (1 - tolerance)
+            elif metric == "surfaces_per_frame":
+                # Allocation counts are exact, allow only rounding noise
+                failed = value > expected + 0.5
+            else:
+                failed = value > expected * (1 + tolerance)
+            if failed:
+                regressions.append(f"{name}.{metric}: {value:.3f} vs baseline {expected:.3f}")
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Falling Blocks benchmarks")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run (default: all of {', '.join([*SCENARIOS, *SIM_SCENARIOS])})")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="exit 0 instead of failing when there is no baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    parser.add_argument("--output", help="also write results as JSON to this path")
+    parser.add_argument("--startup", type=int, metavar="RUNS",
+                        help="instead of the scenarios, time startup with and without the sprite atlas")
+    parser.add_argument("--atlas", default=Config.SPRITE_ATLAS, help="sprite atlas for --startup")
+    parser.add_argument("--startup-probe", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.startup_probe is not None:
+        print(json.dumps(startup_probe(args.startup_probe, args.seed)))
+        return 0
+    if args.startup:
+        if not os.path.exists(args.atlas + ".idx"):
+            print(f"No sprite atlas at {args.atlas}; run build_atlas.py first")
+            return 1
+        results = measure_startup(args.startup, args.atlas, args.seed)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        return 0
+    for name in args.scenarios:
+        if name not in SCENARIOS and name not in SIM_SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+
+    results = {}
+    for name in args.scenarios or [*SCENARIOS, *SIM_SCENARIOS]:
+        if name in SIM_SCENARIOS:
+            results[name] = metrics = run_sim_scenario(name, args.frames, args.warmup, args.seed)
+            print(f"{name:<18} {metrics['ticks_per_sec']:9.0f} ticks/s  {metrics['blocks']} blocks")
+            continue
+        results[name] = metrics = run_scenario(name, args.frames, args.warmup, args.seed)
+        print(f"{name:<18} {metrics['ticks_per_sec']:9.0f} ticks/s {metrics['fps']:8.0f} fps  "
+              f"frame p50 {metrics['frame_p50_ms']:.2f} p95 {metrics['frame_p95_ms']:.2f} "
+              f"p99 {metrics['frame_p99_ms']:.2f} ms  "
+              f"{metrics['surfaces_per_frame']:.2f} surfaces/frame  {metrics['alloc_kb_per_frame']:.1f} KB/frame")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Nothing was checked, which must not pass as "no regressions"
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0 if args.allow_missing_baseline else 1
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,129 @@
+import argparse
+import math
+import os
+import sys
+import time
+
+# Headless: rendering needs no window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+from main import QUALITY_LEVELS, Block, Colors, Config, ParticleSpriteCache, SpriteAtlas, SpriteCache
+
+ATLAS_WIDTH = 2048
+MAX_PARTICLE_SIZE = 8  # Largest particle any effect emits
+
+
+def pack_color(color):
+    return (color[0] << 16) | (color[1] << 8) | color[2]
+
+
+def render_frames():
+    # Frames are rendered through the game's own caches, so their keys and pixels
+    # are exactly what the game would otherwise rasterize on first use. Returns
+    # (record fields, surface) pairs, record fields as in SpriteAtlas.RECORD.
+    sprites = SpriteCache(max_bytes=1 << 40)
+    # Every quality level's rotation step and power-up glow, so a lowered level
+    # still draws from the atlas
+    for level in QUALITY_LEVELS:
+        sprites.angle_step = level.angle_step or Config.SPRITE_ANGLE_STEP
+        sprites.glow_rings = level.glow_rings
+        sprites.prewarm()
+
+    particles = ParticleSpriteCache(max_entries=1 << 30)
+    colors = set(Colors.PARTICLES) | set(Block.PARTICLE_COLORS.values()) | {Colors.GOLD}
+    for color in sorted(colors):
+        for radius_level in range(1, int(MAX_PARTICLE_SIZE / particles.radius_step) + 1):
+            for alpha_level in range(particles.alpha_levels):
+                particles.get(pack_color(color), radius_level, alpha_level)
+
+    def step(pulse):
+        return round(pulse / (2 * math.pi) * sprites.pulse_steps) % sprites.pulse_steps
+
+    frames = []
+    for key, frame in sprites.frames.items():
+        if key[0] == "block":
+            _, size, block_type, power_up_type, angle, pulse, scale, glow_rings = key
+            fields = (SpriteAtlas.BLOCK, size, block_type.value, power_up_type.value if power_up_type else 0,
+                      angle, step(pulse), round(scale * sprites.scale_steps), glow_rings, 0)
+        else:
+            _, size, angle, pulse, color, shielded = key
+            fields = (SpriteAtlas.PLAYER, size, int(shielded), 0, angle, step(pulse), 0, 0, pack_color(color))
+        frames.append((fields, frame))
+    for (color, radius_level, alpha_level), frame in particles.sprites.items():
+        frames.append(((SpriteAtlas.PARTICLE, radius_level, alpha_level, 0, 0, 0, 0, 0, color), frame))
+    return frames, sprites, particles
+
+
+def pack(frames, width):
+    # Shelf packing, tallest first. Identical frames, which the pulse and
+    # rotation symmetries produce plenty of, share one rectangle. Returns a
+    # record per frame, the distinct frames with their rectangles, and the height.
+    rects = {}
+    records = []
+    placed = []
+    x = y = shelf = 0
+    for fields, frame in sorted(frames, key=lambda item: -item[1].get_height()):
+        w, h = frame.get_size()
+        pixels = (w, h, pygame.image.tobytes(frame, "RGBA"))
+        rect = rects.get(pixels)
+        if rect is None:
+            if x + w > width:
+                x, y, shelf = 0, y + shelf, 0
+            rect = rects[pixels] = (x, y, w, h)
+            placed.append((frame, rect))
+            x += w
+            shelf = max(shelf, h)
+        records.append(fields + rect)
+    return records, placed, y + shelf
+
+
+def build(path, width=ATLAS_WIDTH, preview=False):
+    pygame.init()
+    start = time.perf_counter()
+    frames, sprites, particles = render_frames()
+    # Frames grouped into pages, so the game only inflates the ones it draws from
+    groups = {}
+    for fields, frame in frames:
+        groups.setdefault(SpriteAtlas.page_key(fields[0], fields[2], fields[8]), []).append((fields, frame))
+    pages, records, distinct = [], 0, 0
+    for key in sorted(groups):
+        page_records, placed, height = pack(groups[key], width)
+        image = pygame.Surface((width, height), pygame.SRCALPHA)
+        image.fill((0, 0, 0, 0))
+        for frame, rect in placed:
+            # Max against transparent black copies the pixels as they are; a normal
+            # blit would blend them
+            image.blit(frame, rect[:2], special_flags=pygame.BLEND_RGBA_MAX)
+        pages.append((key, image, np.array(page_records, dtype=SpriteAtlas.RECORD)))
+        records += len(page_records)
+        distinct += len(placed)
+
+    SpriteAtlas.save(path, pages, sprites.pulse_steps, sprites.scale_steps, particles.radius_step,
+                     particles.alpha_levels)
+    if preview:
+        for index, (_, image, _) in enumerate(pages):
+            pygame.image.save(image, f"{path}.{index}.png")
+    print(f"{records} frames, {distinct} distinct, built in {time.perf_counter() - start:.2f} s")
+    print(f"{path}.pix: {len(pages)} pages of {width}x{max(image.get_height() for _, image, _ in pages)} or less, "
+          f"{os.path.getsize(path + '.pix')} bytes; "
+          f"{path}.idx: {os.path.getsize(path + '.idx')} bytes")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render the Falling Blocks sprites into an atlas")
+    parser.add_argument("path", nargs="?", default=Config.SPRITE_ATLAS,
+                        help="output path without extension (default: %(default)s)")
+    parser.add_argument("--width", type=int, default=ATLAS_WIDTH, help="atlas width in pixels")
+    parser.add_argument("--preview", action="store_true", help="also write each page as PATH.<page>.png")
+    args = parser.parse_args(argv)
+    build(args.path, args.width, args.preview)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
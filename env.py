@@ -0,0 +1,329 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# Headless: no window, no audio device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+from main import Action, BlockType, Config, PowerUpType, Simulation
+
+# Discrete actions, by index
+ACTIONS = (Action.STOP, Action.LEFT, Action.RIGHT)
+STOP, LEFT, RIGHT = range(len(ACTIONS))
+
+# Observation: the player, then the nearest blocks, nearest first.
+#   player: x, velocity, lives, fall speed, shield, slow time, magnet (timers as
+#           the fraction left)
+#   block:  dx, dy (block centre relative to the player's, dy > 0 above it,
+#           in screen widths and heights), one-hot BlockType, present
+# Rows for missing blocks are all zero.
+PLAYER_FEATURES = 7
+BLOCK_FEATURES = 2 + len(BlockType) + 1
+LIVES_CAP = 5  # As capped by Simulation.collect
+SPEED_CAP = 15  # As capped by Simulation.step
+
+
+class FallingBlocksEnv:
+    # Gym-style environment over Simulation: reset() -> (obs, info) and
+    # step(action) -> (obs, reward, terminated, truncated, info). The reward is
+    # the score gained plus life_value per life gained or lost. Episodes are
+    # seeded from seed, so a run of resets is reproducible. The playfield is
+    # Config.WIDTH x Config.HEIGHT, shared by every env in the process.
+    def __init__(self, seed=None, observed_blocks=8, max_ticks=None, life_value=10.0):
+        self.sim = Simulation()
+        self.seeds = random.Random(seed)
+        self.observed_blocks = observed_blocks
+        self.max_ticks = max_ticks
+        self.life_value = life_value
+        self.observation_size = PLAYER_FEATURES + observed_blocks * BLOCK_FEATURES
+        self.action_count = len(ACTIONS)
+
+    def reset(self, seed=None, out=None):
+        self.sim.reset(seed if seed is not None else self.seeds.getrandbits(32))
+        return self.observe(out), self.info()
+
+    def step(self, action, out=None):
+        sim = self.sim
+        score, lives = sim.score, sim.lives
+        sim.step(ACTIONS[action] if not isinstance(action, Action) else action)
+        reward = (sim.score - score) + self.life_value * (sim.lives - lives)
+        truncated = self.max_ticks is not None and sim.ticks >= self.max_ticks and not sim.game_over
+        return self.observe(out), reward, sim.game_over, truncated, self.info()
+
+    def snapshot(self):
+        # Flat copy of the episode state, for lookahead search
+        return self.sim.snapshot()
+
+    def restore(self, data):
+        self.sim.restore(data)
+
+    def info(self):
+        sim = self.sim
+        return {"score": sim.score, "lives": sim.lives, "ticks": sim.ticks, "seed": sim.seed}
+
+    def observe(self, out=None):
+        if out is None:
+            out = np.zeros(self.observation_size, dtype=np.float32)
+        else:
+            out[:] = 0
+        sim = self.sim
+        player = sim.player
+        width, height = Config.WIDTH, Config.HEIGHT
+        half = player.size / 2
+        px, py = player.pos[0] + half, player.pos[1] + half
+        powers = player.active_powers
+        out[:PLAYER_FEATURES] = (
+            px / width,
+            player.velocity / player.speed,
+            sim.lives / LIVES_CAP,
+            sim.speed / SPEED_CAP,
+            powers[PowerUpType.SHIELD] / Config.SHIELD_DURATION,
+            powers[PowerUpType.SLOW_TIME] / Config.SLOW_TIME_DURATION,
+            powers[PowerUpType.MAGNET] / Config.MAGNET_DURATION,
+        )
+
+        blocks = sim.blocks
+        rows = np.flatnonzero(blocks.active[:blocks.count])
+        if rows.size == 0:
+            return out
+        block_half = blocks.size / 2
+        dx = blocks.x[rows] + block_half - px
+        dy = py - (blocks.y[rows] + block_half)
+        distance = dx * dx + dy * dy
+        k = self.observed_blocks
+        if rows.size > k:
+            nearest = np.argpartition(distance, k)[:k]
+            rows, dx, dy, distance = rows[nearest], dx[nearest], dy[nearest], distance[nearest]
+        order = np.argsort(distance, kind="stable")
+        m = order.size
+        table = out[PLAYER_FEATURES:].reshape(k, BLOCK_FEATURES)
+        table[:m, 0] = dx[order] / width
+        table[:m, 1] = dy[order] / height
+        table[np.arange(m), 2 + blocks.block_type[rows[order]]] = 1
+        table[:m, -1] = 1
+        return out
+
+
+class VectorEnv:
+    # N environments stepped in lockstep in this process. Observations come back
+    # as one (N, observation_size) float32 array and rewards, terminations and
+    # truncations as (N,) arrays. An episode that ends is reset straight away; the
+    # info arrays hold the finished episode's score, lives and ticks for those rows.
+    def __init__(self, num_envs, seed=0, **env_kwargs):
+        self.envs = [FallingBlocksEnv(seed + i, **env_kwargs) for i in range(num_envs)]
+        self.num_envs = num_envs
+        self.observation_size = self.envs[0].observation_size
+        self.action_count = self.envs[0].action_count
+        self.observations = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+
+    def reset(self, seeds=None):
+        for i, env in enumerate(self.envs):
+            env.reset(None if seeds is None else seeds[i], out=self.observations[i])
+        return self.observations.copy(), self.infos()
+
+    def step(self, actions):
+        n = self.num_envs
+        rewards = np.zeros(n, dtype=np.float32)
+        terminated = np.zeros(n, dtype=bool)
+        truncated = np.zeros(n, dtype=bool)
+        finished = {}
+        for i, env in enumerate(self.envs):
+            obs, rewards[i], terminated[i], truncated[i], info = env.step(int(actions[i]), out=self.observations[i])
+            if terminated[i] or truncated[i]:
+                finished[i] = info
+                env.reset(out=self.observations[i])
+        infos = self.infos()
+        for i, info in finished.items():
+            for key in infos:
+                infos[key][i] = info[key]
+        return self.observations.copy(), rewards, terminated, truncated, infos
+
+    def infos(self):
+        sims = [env.sim for env in self.envs]
+        return {
+            "score": np.array([sim.score for sim in sims], dtype=np.int64),
+            "lives": np.array([sim.lives for sim in sims], dtype=np.int64),
+            "ticks": np.array([sim.ticks for sim in sims], dtype=np.int64),
+        }
+
+    def close(self):
+        pass
+
+
+def apply_config(overrides):
+    # Workers may be spawned rather than forked, so Config changes are passed along
+    for key, value in (overrides or {}).items():
+        setattr(Config, key, value)
+
+
+def vector_worker(conn, num_envs, seed, overrides, env_kwargs):
+    apply_config(overrides)
+    env = VectorEnv(num_envs, seed, **env_kwargs)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "step":
+                conn.send(env.step(data))
+            elif command == "reset":
+                conn.send(env.reset(data))
+            else:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+
+class ProcessVectorEnv:
+    # VectorEnv sharded across worker processes: each worker steps a contiguous
+    # slice of the environments, the parent sends every shard its actions before
+    # collecting any results, so shards run in parallel, and concatenates the
+    # results in env order. Same interface as VectorEnv.
+    def __init__(self, num_envs, workers=None, seed=0, config=None, **env_kwargs):
+        workers = max(1, min(workers or os.cpu_count() or 1, num_envs))
+        sizes = [num_envs // workers + (i < num_envs % workers) for i in range(workers)]
+        self.bounds = np.cumsum([0] + sizes)
+        self.num_envs = num_envs
+        self.connections = []
+        self.processes = []
+        for i, size in enumerate(sizes):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=vector_worker, args=(child, size, seed + int(self.bounds[i]), config, env_kwargs), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        probe = FallingBlocksEnv(**env_kwargs)
+        self.observation_size = probe.observation_size
+        self.action_count = probe.action_count
+
+    def shards(self, values):
+        return [None if values is None else values[start:end] for start, end in zip(self.bounds, self.bounds[1:])]
+
+    def gather(self, results):
+        columns = list(zip(*results))
+        merged = [np.concatenate(column) for column in columns[:-1]]
+        infos = {key: np.concatenate([info[key] for info in columns[-1]]) for key in columns[-1][0]}
+        return (*merged, infos)
+
+    def reset(self, seeds=None):
+        for conn, shard in zip(self.connections, self.shards(seeds)):
+            conn.send(("reset", shard))
+        return self.gather([conn.recv() for conn in self.connections])
+
+    def step(self, actions):
+        for conn, shard in zip(self.connections, self.shards(np.asarray(actions))):
+            conn.send(("step", shard))
+        return self.gather([conn.recv() for conn in self.connections])
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        self.connections = []
+        self.processes = []
+
+
+# Policies map one observation to an action index; module-level so they pickle
+
+def random_policy(obs):
+    return random.randrange(len(ACTIONS))
+
+
+def dodge_policy(obs):
+    # Step away from the nearest harmful block about to land on the player,
+    # otherwise head for the nearest block worth catching
+    table = obs[PLAYER_FEATURES:].reshape(-1, BLOCK_FEATURES)
+    present = table[:, -1] == 1
+    harmful = table[:, 2 + BlockType.HARMFUL.value] == 1
+    above = table[:, 1] > 0
+    threats = table[present & harmful & above & (table[:, 1] < 0.3) & (np.abs(table[:, 0]) < 0.06)]
+    if len(threats):
+        return RIGHT if threats[0, 0] < 0 else LEFT
+    wanted = table[present & ~harmful & above]
+    if len(wanted) and abs(wanted[0, 0]) > 0.01:
+        return RIGHT if wanted[0, 0] > 0 else LEFT
+    return STOP
+
+
+POLICIES = {"random": random_policy, "dodge": dodge_policy}
+
+
+def run_episode(args):
+    policy, seed, max_ticks, overrides, env_kwargs = args
+    apply_config(overrides)
+    env = FallingBlocksEnv(max_ticks=max_ticks, **env_kwargs)
+    obs, info = env.reset(seed)
+    total = 0.0
+    done = False
+    while not done:
+        obs, reward, terminated, truncated, info = env.step(policy(obs), out=obs)
+        total += reward
+        done = terminated or truncated
+    return {"seed": seed, "reward": total, **info}
+
+
+def evaluate(policy, episodes, processes=None, seed=0, max_ticks=None, config=None, **env_kwargs):
+    # Independent episodes on a process pool; returns one result dict per episode
+    seeds = random.Random(seed)
+    jobs = [(policy, seeds.getrandbits(32), max_ticks, config, env_kwargs) for _ in range(episodes)]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(run_episode, jobs, chunksize=max(1, episodes // (4 * (processes or os.cpu_count() or 1))))
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Falling Blocks environments")
+    parser.add_argument("--envs", type=int, default=64, help="environments stepped in lockstep")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0: step in this process)")
+    parser.add_argument("--steps", type=int, default=2000, help="lockstep steps to time")
+    parser.add_argument("--evaluate", type=int, metavar="EPISODES", help="evaluate a policy instead of timing")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="dodge")
+    parser.add_argument("--max-ticks", type=int, default=10000, help="episode length limit")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.evaluate:
+        start = time.perf_counter()
+        results = evaluate(POLICIES[args.policy], args.evaluate, args.workers or None, args.seed, args.max_ticks)
+        elapsed = time.perf_counter() - start
+        scores = np.array([result["score"] for result in results])
+        ticks = sum(result["ticks"] for result in results)
+        print(f"{args.policy}: {len(results)} episodes, score mean {scores.mean():.1f} "
+              f"median {np.median(scores):.0f} max {scores.max()}, {ticks / elapsed:.0f} steps/s")
+        return 0
+
+    if args.workers:
+        env = ProcessVectorEnv(args.envs, args.workers, args.seed, max_ticks=args.max_ticks)
+    else:
+        env = VectorEnv(args.envs, args.seed, max_ticks=args.max_ticks)
+    rng = np.random.default_rng(args.seed)
+    try:
+        env.reset()
+        start = time.perf_counter()
+        episodes = 0
+        for _ in range(args.steps):
+            obs, rewards, terminated, truncated, infos = env.step(rng.integers(0, env.action_count, args.envs))
+            episodes += int((terminated | truncated).sum())
+        elapsed = time.perf_counter() - start
+    finally:
+        env.close()
+    steps = args.steps * args.envs
+    print(f"{steps} steps across {args.envs} envs in {elapsed:.2f} s: {steps / elapsed:.0f} steps/s "
+          f"({steps / elapsed * 3600 / 1e6:.1f}M steps/hour), {episodes} episodes finished")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,206 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# One finished run. Records are fixed-size so both files load with a single
+# numpy read; crc covers every field before it.
+RECORD = struct.Struct("<IIId16sI")  # seq, score, seed, time, name, crc
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u4"),
+    ("score", "<u4"),
+    ("seed", "<u4"),
+    ("time", "<f8"),
+    ("name", "S16"),
+    ("crc", "<u4"),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# Snapshot header: magic, record count, highest seq folded in, crc of the records
+SNAPSHOT_MAGIC = b"FBHS"
+SNAPSHOT_HEADER = struct.Struct("<4sIII")
+
+
+class HighScoreStore:
+    # Every finished run is appended to <path>.log. Every compact_every runs the
+    # log is folded into <path>.dat, a snapshot kept sorted best-first, which is
+    # written to a temporary file and renamed over the old one so a crash leaves
+    # either the old or the new snapshot. The snapshot remembers the last seq it
+    # contains, so log records that survive a crash before the log is reset are
+    # not counted twice, and a torn record at the end of the log is dropped.
+    #
+    # In memory all runs are kept in one structured array sorted by score (ties
+    # by age), so top-K is a slice and rank lookups are a binary search. If the
+    # files cannot be read or written the store carries on in memory only.
+    #
+    # add() only touches memory; flush() does the file I/O and may run on another
+    # thread, so the two share a lock around the in-memory state.
+    def __init__(self, path="high_scores", legacy_path="high_scores.txt", compact_every=256):
+        self.snapshot_path = path + ".dat"
+        self.log_path = path + ".log"
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.keys = np.zeros(0, dtype=np.int64)  # -score, ascending
+        self.last_seq = 0
+        self.logged = 0
+        self.unsaved = []
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.persistent = True
+        try:
+            self.load()
+        except OSError:
+            self.persistent = False
+
+    # Reading
+
+    def __len__(self):
+        return len(self.records)
+
+    def top(self, k):
+        return [self.describe(record) for record in self.records[:k]]
+
+    def top_scores(self, k):
+        return self.records["score"][:k].tolist()
+
+    def rank(self, score):
+        # 1-based position a new run with this score would take
+        return int(np.searchsorted(self.keys, -score, side="right")) + 1
+
+    @staticmethod
+    def describe(record):
+        return {
+            "score": int(record["score"]),
+            "name": record["name"].rstrip(b"\0").decode("utf-8", "replace"),
+            "time": float(record["time"]),
+            "seed": int(record["seed"]),
+        }
+
+    # Writing
+
+    def add(self, score, name="", seed=0, timestamp=None):
+        # Records the run in memory and returns its rank; flush() writes it out
+        with self.lock:
+            rank = self.rank(score)
+            record = self.make_record(score, name, seed, timestamp)
+            self.insert(record)
+            self.unsaved.append(record)
+        return rank
+
+    def flush(self):
+        # Appends every run added since the last flush in one write, compacting
+        # when due. The batch and snapshot are taken together, so runs added
+        # meanwhile stay queued for the next flush rather than being lost.
+        with self.io_lock:
+            with self.lock:
+                batch, self.unsaved = self.unsaved, []
+                records, last_seq = self.records, self.last_seq
+            if batch and self.persistent:
+                self.append(np.concatenate(batch), records, last_seq)
+
+    def make_record(self, score, name="", seed=0, timestamp=None):
+        self.last_seq += 1
+        fields = (self.last_seq, score, seed, time.time() if timestamp is None else timestamp,
+                  name.encode("utf-8")[:16])
+        packed = RECORD.pack(*fields, 0)
+        return np.frombuffer(RECORD.pack(*fields, zlib.crc32(packed[:-4])), dtype=RECORD_DTYPE)
+
+    def insert(self, records):
+        # Merge new records into the index in one pass, best first, ties oldest first
+        keys = -records["score"].astype(np.int64)
+        order = np.lexsort((records["seq"], keys))
+        positions = np.searchsorted(self.keys, keys[order], side="right")
+        self.records = np.insert(self.records, positions, records[order])
+        self.keys = np.insert(self.keys, positions, keys[order])
+
+    def append(self, batch, records, last_seq):
+        try:
+            with open(self.log_path, "ab") as f:
+                f.write(batch.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.logged += len(batch)
+            if self.logged >= self.compact_every:
+                self.compact(records, last_seq)
+        except OSError:
+            self.persistent = False
+
+    def compact(self, records, last_seq):
+        # Write the whole table as a new snapshot, swap it in, then reset the log
+        body = records.tobytes()
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(records), last_seq, zlib.crc32(body))
+        self.replace(self.snapshot_path, header + body)
+        self.replace(self.log_path, b"")
+        self.logged = 0
+
+    @staticmethod
+    def replace(path, data):
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    # Loading
+
+    def load(self):
+        snapshot_seq = self.load_snapshot()
+        if not os.path.exists(self.snapshot_path) and not os.path.exists(self.log_path):
+            self.migrate()
+            return
+
+        with open(self.log_path, "ab+") as f:
+            f.seek(0)
+            data = f.read()
+            whole = len(data) - len(data) % RECORD.size
+            if whole != len(data):
+                # Torn write from a crash mid-append
+                f.truncate(whole)
+        records = np.frombuffer(data[:whole], dtype=RECORD_DTYPE)
+        # Skip runs already in the snapshot and any record that fails its check
+        valid = np.array([
+            zlib.crc32(data[i * RECORD.size:(i + 1) * RECORD.size - 4]) == crc
+            for i, crc in enumerate(records["crc"].tolist())
+        ], dtype=bool) & (records["seq"] > snapshot_seq)
+        if valid.any():
+            self.insert(records[valid])
+            self.last_seq = max(self.last_seq, int(records["seq"][valid].max()))
+        self.logged = len(records)
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) >= SNAPSHOT_HEADER.size:
+            magic, count, last_seq, crc = SNAPSHOT_HEADER.unpack_from(data)
+            body = data[SNAPSHOT_HEADER.size:]
+        if (len(data) < SNAPSHOT_HEADER.size or magic != SNAPSHOT_MAGIC or len(body) != count * RECORD.size
+                or zlib.crc32(body) != crc):
+            # Renames are atomic, so this is outside damage; keep the file for inspection
+            os.replace(self.snapshot_path, self.snapshot_path + ".corrupt")
+            return 0
+        # Snapshots are written sorted, so the index is ready as loaded
+        self.records = np.frombuffer(body, dtype=RECORD_DTYPE).copy()
+        self.keys = -self.records["score"].astype(np.int64)
+        self.last_seq = last_seq
+        return last_seq
+
+    def migrate(self):
+        # One-off import of the old comma-separated top-5 file
+        try:
+            with open(self.legacy_path) as f:
+                scores = [int(score) for score in f.read().split(",") if score.strip()]
+        except (OSError, ValueError):
+            return
+        scores = [score for score in scores if score > 0]
+        if not scores:
+            return
+        self.insert(np.concatenate([self.make_record(score, timestamp=0) for score in scores]))
+        self.compact(self.records, self.last_seq)
@@ -0,0 +1,391 @@
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# Wire format: one JSON object per line each way.
+#   {"op": "submit", "runs": [run, ...]}  -> {"ok": true, "ranks": [...]}
+#   {"op": "top", "n": 10}                 -> {"top": [entry, ...]}
+#   {"op": "rank", "score": 120}           -> {"rank": 4}
+# A run is {"id", "score", "name", "seed", "time", "machine"}; the id makes a
+# retried submission harmless, the server keeps the first copy it sees.
+DEFAULT_PORT = 8765
+MAX_BATCH = 256
+MAX_TOP = 100
+INT64_MIN, INT64_MAX = -1 << 63, (1 << 63) - 1  # Range of an SQLite INTEGER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL UNIQUE,
+    score INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    time REAL NOT NULL,
+    machine TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (score DESC, id);
+"""
+
+
+class LeaderboardServer:
+    # Every submission goes through one writer task, which commits whatever has
+    # queued up since its last pass in a single transaction. Queries are short
+    # indexed reads, so they run directly on the event loop.
+    def __init__(self, path="leaderboard.db"):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.runs = 0
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        writer = asyncio.create_task(self.write_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer.cancel()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.dispatch(json.loads(line))
+                except Exception as e:
+                    reply = {"error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Client went away, or sent a line over the stream limit
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        op = request["op"]
+        if op == "submit":
+            runs = [self.validate(run) for run in request["runs"][:MAX_BATCH]]
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((runs, future))
+            return {"ok": True, "ranks": await future}
+        if op == "top":
+            return {"top": self.top(min(int(request.get("n", 10)), MAX_TOP))}
+        if op == "rank":
+            return {"rank": self.rank(int(request["score"]))}
+        raise ValueError(f"unknown op {op!r}")
+
+    @staticmethod
+    def validate(run):
+        # Coerces a run to what the table can hold, or raises ValueError, so a
+        # bad run is refused before it reaches the writer's shared transaction
+        try:
+            score = int(run["score"])
+            seed = int(run.get("seed", 0))
+        except OverflowError as e:  # int() of an infinite float
+            raise ValueError(str(e)) from None
+        t = float(run.get("time", time.time()))
+        if not math.isfinite(t):
+            raise ValueError(f"time {t} is not finite")
+        return (
+            str(run["id"])[:64],
+            min(max(0, score), INT64_MAX),
+            str(run.get("name", ""))[:16],
+            min(max(INT64_MIN, seed), INT64_MAX),
+            t,
+            str(run.get("machine", ""))[:64],
+        )
+
+    async def write_loop(self):
+        while True:
+            pending = [await self.queue.get()]
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+            try:
+                results = self.store([runs for runs, _ in pending])
+            except Exception:
+                # The whole transaction rolled back; store the batches one at a
+                # time so only the ones that fail again get the error
+                results = []
+                for runs, _ in pending:
+                    try:
+                        results.append(self.store([runs])[0])
+                    except Exception as e:
+                        results.append(e)
+            for (_, future), ranks in zip(pending, results):
+                if future.done():
+                    continue
+                if isinstance(ranks, Exception):
+                    future.set_exception(ranks)
+                else:
+                    future.set_result(ranks)
+
+    def store(self, batches):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO runs (run_id, score, name, seed, time, machine) VALUES (?, ?, ?, ?, ?, ?)",
+                [run for runs in batches for run in runs])
+            results = [[self.rank_of(run[0]) for run in runs] for runs in batches]
+        self.batches += 1
+        self.runs += sum(len(runs) for runs in batches)
+        return results
+
+    def rank_of(self, run_id):
+        # Position of a stored run; equal scores rank in submission order
+        row_id, score = self.db.execute("SELECT id, score FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        above = self.db.execute("SELECT COUNT(*) FROM runs WHERE score > ?", (score,)).fetchone()[0]
+        tied = self.db.execute("SELECT COUNT(*) FROM runs WHERE score = ? AND id < ?", (score, row_id)).fetchone()[0]
+        return above + tied + 1
+
+    def rank(self, score):
+        # Position a new run with this score would take
+        return self.db.execute("SELECT COUNT(*) FROM runs WHERE score >= ?", (score,)).fetchone()[0] + 1
+
+    def top(self, n):
+        rows = self.db.execute(
+            "SELECT score, name, machine, time FROM runs ORDER BY score DESC, id LIMIT ?", (n,))
+        return [{"score": score, "name": name, "machine": machine, "time": t} for score, name, machine, t in rows]
+
+
+class LeaderboardError(ValueError):
+    # The server answered a request with an error
+    pass
+
+
+class ConnectionPool:
+    # Keeps up to size connections open between requests. A pooled connection may
+    # have been dropped by the server since it was last used, so a request that
+    # fails on one is retried once on a fresh connection.
+    def __init__(self, host, port=DEFAULT_PORT, size=2, timeout=2.0):
+        self.address = (host, port)
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def connect(self):
+        sock = socket.create_connection(self.address, self.timeout)
+        self.opened += 1
+        return sock, sock.makefile("rwb")
+
+    def request(self, message):
+        data = json.dumps(message).encode() + b"\n"
+        while True:
+            with self.lock:
+                pooled = self.idle.pop() if self.idle else None
+            connection = pooled or self.connect()
+            sock, file = connection
+            try:
+                file.write(data)
+                file.flush()
+                line = file.readline()
+                if not line:
+                    raise ConnectionError("connection closed by server")
+            except OSError:
+                file.close()
+                sock.close()
+                if pooled is None:
+                    raise
+                continue
+            reply = self.decode(line)
+            if reply is None:
+                # Not an answer to the request, and the stream cannot be trusted after it
+                file.close()
+                sock.close()
+                raise ConnectionError("garbled reply from server")
+            self.release(connection)
+            if "error" in reply:
+                raise LeaderboardError(reply["error"])
+            return reply
+
+    @staticmethod
+    def decode(line):
+        # The reply object, or None for anything else
+        try:
+            reply = json.loads(line)
+        except ValueError:
+            return None
+        return reply if isinstance(reply, dict) else None
+
+    def release(self, connection):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(connection)
+                return
+        connection[1].close()
+        connection[0].close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for sock, file in idle:
+            file.close()
+            sock.close()
+
+
+class LeaderboardClient:
+    # Game side of the leaderboard. Every network call is a job on the persistence
+    # worker, so nothing here blocks the frame loop. Runs wait in an outbox and go
+    # out in batches; a batch that cannot be delivered, or gets a garbled reply,
+    # stays queued and is retried with exponential backoff, while one the server
+    # refuses would be refused again, so it is moved to self.rejected instead. The
+    # top-N is cached for ttl seconds, and while the server cannot be reached
+    # top() returns None so callers use the local store.
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, host, port, worker, ttl=10.0, pool_size=2, timeout=2.0, batch_size=64):
+        self.pool = ConnectionPool(host, port, pool_size, timeout)
+        self.worker = worker
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.machine = socket.gethostname()
+        self.lock = threading.Lock()
+        self.outbox = []
+        self.rejected = []  # Runs the server refused, kept for inspection
+        self.sending = False
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.cache = None  # Entries best first, None while offline
+        self.cache_time = float("-inf")
+        self.top_n = 10
+        self.fetching = False
+        self.sent = 0
+        self.failures = 0
+
+    def submit(self, score, name="", seed=0):
+        # Queues the run and returns its rank in the cached table (top_n + 1 when
+        # it falls off the end), or None if there is no table to rank against
+        run = {"id": uuid.uuid4().hex, "score": score, "name": name, "seed": seed,
+               "time": time.time(), "machine": self.machine}
+        with self.lock:
+            self.outbox.append(run)
+            rank = None
+            if self.cache is not None:
+                # Shown straight away, the next fetch replaces it with the server's copy
+                position = bisect.bisect_right([-entry["score"] for entry in self.cache], -score)
+                self.cache.insert(position, {"score": score, "name": name, "machine": self.machine,
+                                             "time": run["time"]})
+                rank = min(position, self.top_n) + 1
+        self.poll()
+        return rank
+
+    def top(self, n):
+        # Cached top-n scores; refreshed in the background once older than ttl
+        with self.lock:
+            self.top_n = n
+            if not self.fetching and time.monotonic() - self.cache_time > self.ttl:
+                self.fetching = True
+                self.worker.submit("leaderboard.fetch", self.fetch)
+            if self.cache is None:
+                return None
+            return [entry["score"] for entry in self.cache[:n]]
+
+    def poll(self):
+        # Sends queued runs unless a send is in flight or backing off
+        with self.lock:
+            if not self.outbox or self.sending or time.monotonic() < self.retry_at:
+                return
+            self.sending = True
+        self.worker.submit("leaderboard.send", self.send)
+
+    def send(self):
+        # Runs on the persistence worker
+        with self.lock:
+            batch = self.outbox[:self.batch_size]
+        # done: the batch leaves the outbox; refused: the server replied with an
+        # error, which resending the same runs would only repeat
+        done = refused = False
+        try:
+            self.pool.request({"op": "submit", "runs": batch})
+            done = True
+        except LeaderboardError:
+            done = refused = True
+        except OSError:
+            pass
+        with self.lock:
+            self.sending = False
+            if done:
+                del self.outbox[:len(batch)]
+                if refused:
+                    self.rejected.extend(batch)
+                else:
+                    self.sent += len(batch)
+                self.backoff = 0.0
+            else:
+                self.failures += 1
+                self.backoff = min(self.backoff * 2 or 1.0, self.MAX_BACKOFF)
+                self.retry_at = time.monotonic() + self.backoff
+        if done:
+            self.poll()
+
+    def fetch(self):
+        # Runs on the persistence worker
+        try:
+            entries = self.pool.request({"op": "top", "n": self.top_n})["top"]
+        except (OSError, ValueError, KeyError):
+            entries = None
+        with self.lock:
+            self.fetching = False
+            self.cache_time = time.monotonic()
+            if entries is not None:
+                # Runs not yet accepted by the server still show
+                for run in self.outbox:
+                    position = bisect.bisect_right([-entry["score"] for entry in entries], -run["score"])
+                    entries.insert(position, run)
+            self.cache = entries
+
+    def close(self):
+        # Last attempt to deliver queued runs, ignoring any backoff; called on quit
+        with self.lock:
+            self.retry_at = 0.0
+        self.poll()
+        self.worker.flush()
+        self.pool.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "online": self.cache is not None,
+                "queued": len(self.outbox),
+                "sent": self.sent,
+                "rejected": len(self.rejected),
+                "failures": self.failures,
+                "backoff_s": self.backoff,
+                "connections_opened": self.pool.opened,
+            }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Shared Falling Blocks leaderboard server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default="leaderboard.db", help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = LeaderboardServer(args.db)
+        print(f"Leaderboard on {args.host}:{args.port}, database {args.db}")
+        await server.serve(args.host, args.port)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,9 +1,20 @@
 import pygame
 import random
 import sys
+import os
 import math
+import time
 from enum import Enum, auto
+from collections import OrderedDict, deque
 import asyncio
+import threading
+import json
+import struct
+import zlib
+import numpy as np
+
+from highscores import HighScoreStore
+from leaderboard import LeaderboardClient
 
 
 class GameState(Enum):
@@ -21,6 +32,20 @@ class BlockType(Enum):
     POWER_UP = 3
 
 
+class Action(Enum):
+    # Per-tick player input; the value is the movement direction
+    STOP = 0
+    LEFT = -1
+    RIGHT = 1
+
+
+class SimEvent(Enum):
+    COLLECT = auto()  # Player touched a block
+    DODGE = auto()  # Harmful block left the screen untouched
+    HIT = auto()  # Harmful block cost a life
+    GAME_OVER = auto()
+
+
 class PowerUpType(Enum):
     SHIELD = auto()
     SLOW_TIME = auto()
@@ -28,6 +53,9 @@ class PowerUpType(Enum):
     EXTRA_LIFE = auto()
 
 
+POWER_UP_TYPES = list(PowerUpType)
+
+
 class Colors:
     CORAL = (255, 127, 80)
     TEAL = (0, 128, 128)
@@ -48,7 +76,10 @@ class Colors:
 class Config:
     WIDTH = 1280
     HEIGHT = 720
-    FPS = 60
+    FPS = 60  # Render frame cap, 0 for uncapped
+    TICK_RATE = 60  # Simulation ticks per second, independent of FPS
+    MAX_TICKS_PER_FRAME = 5  # Catch-up limit before dropping simulation time
+    MAX_FRAME_TIME = 0.25  # Longest frame (seconds) fed to the simulation
     PLAYER_SIZE = 50
     BLOCK_SIZE = 50
     INITIAL_SPEED = 5
@@ -57,48 +88,462 @@ class Config:
     MAX_BLOCKS = 15
     POWER_UP_CHANCE = 0.05
     HIGH_SCORES_COUNT = 5
-    SHIELD_DURATION = 5 * FPS  # 5 seconds
-    SLOW_TIME_DURATION = 3 * FPS  # 3 seconds
-    MAGNET_DURATION = 7 * FPS  # 7 seconds
+    HIGH_SCORE_STORE = "high_scores"  # Run history in high_scores.dat + high_scores.log
+    HIGH_SCORES_FILE = "high_scores.txt"  # Old top-5 file, imported once
+    LEADERBOARD_HOST = None  # Shared leaderboard server (see leaderboard.py), e.g. "127.0.0.1"
+    LEADERBOARD_PORT = 8765
+    LEADERBOARD_TTL = 10.0  # Seconds the shared top scores are cached
+    SHIELD_DURATION = 5 * TICK_RATE  # 5 seconds
+    SLOW_TIME_DURATION = 3 * TICK_RATE  # 3 seconds
+    MAGNET_DURATION = 7 * TICK_RATE  # 7 seconds
     MAGNET_RADIUS = 200
     PARTICLE_LIFE = 30
     ANIMATION_SPEED = 0.1
     MIN_WIDTH = 1280  # Minimum width
     MIN_HEIGHT = 720  # Minimum height
+    PARTICLE_SPRITE_CACHE_SIZE = 2048  # Max cached particle sprites
+    PARTICLE_RADIUS_STEP = 1  # Radius quantization in pixels
+    PARTICLE_ALPHA_LEVELS = 16  # Number of distinct alpha values
+    SPRITE_ANGLE_STEP = 5  # Rotation resolution of cached sprite frames in degrees
+    SPRITE_PULSE_STEPS = 16  # Cached frames per pulse cycle
+    SPRITE_SCALE_STEPS = 10  # Cached frames between scale 0 and 1
+    SPRITE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Memory cap for cached sprite frames
+    SPRITE_PREWARM = False  # Render all full-size frames at startup instead of on first use
+    SPRITE_ATLAS = "sprite_atlas"  # Frames pre-rendered by build_atlas.py (.pix + .idx); drawn at runtime when missing
+    TEXT_CACHE_SIZE = 256  # Max cached rendered text surfaces
+    SIM_VECTOR_MIN_BLOCKS = 32  # Live blocks from which the Simulation updates them with NumPy instead of a plain loop
+    DIRTY_RECTS = False  # Present only changed regions instead of flipping the whole screen
+    DIRTY_PULSE_LEVELS = 8  # Brightness steps of pulsing text while DIRTY_RECTS is on
+    HUD_PULSE_LEVELS = 16  # Cached brightness steps of the pulsing heart
+    PROFILER = True  # Per-phase frame timings, cheap enough to leave on; F3 overlay, F4 export
+    PROFILER_WINDOW = 600  # Frames kept for rolling percentiles
+    PROFILER_OVERLAY_REFRESH = 15  # Frames between overlay redraws
+    RECORD_REPLAYS = True  # Save a replay of every finished game
+    REPLAY_DIR = "replays"
+    PERSISTENCE_WINDOW = 100  # Recent saves kept for the save latency stats
+    STARS_PER_MEGAPIXEL = 400  # Star density, scales the star count with the window
+    STAR_LAYERS = 3  # Parallax layers, nearer layers scroll faster
+    STAR_TWINKLE_GROUPS = 2  # Out-of-phase twinkle groups per layer
+    CANVAS_SIZE = None  # Fixed logical resolution, e.g. (1280, 720), scaled to fit the window; None draws at window size
+    CANVAS_FILTER = "smooth"  # Scaling of the canvas to the window: "smooth" (bilinear) or "nearest"
+    QUALITY = "auto"  # Effects quality: "auto" follows the frame rate, or fixed "low", "medium", "high"; F5 cycles
+    QUALITY_TARGET_MS = None  # Frame work budget for "auto"; None means 1000 / FPS (60 FPS when uncapped)
+    QUALITY_WINDOW = 120  # Frames judged per quality decision
+    QUALITY_UPGRADE_WINDOWS = 4  # Consecutive windows with headroom needed to step back up
+
+
+def prepare_surface(surface):
+    # Convert to the display's pixel format when a display exists
+    if pygame.display.get_surface() is not None:
+        return surface.convert_alpha()
+    return surface
+
+
+def premultiplied(surface):
+    # premul_alpha misreads surfaces with padded rows, which font renders have,
+    # so copy onto a fresh surface first
+    copy = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+    copy.blit(surface, (0, 0))
+    return copy.premul_alpha()
+
+
+class Fonts:
+    # Every font/size pair is loaded once and shared
+    _fonts = {}
+    loads = 0
+
+    @classmethod
+    def get(cls, size):
+        return cls._load(("default", size), lambda: pygame.font.Font(pygame.font.get_default_font(), size))
+
+    @classmethod
+    def system(cls, name, size):
+        return cls._load((name, size), lambda: pygame.font.SysFont(name, size))
+
+    @classmethod
+    def _load(cls, key, loader):
+        font = cls._fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = cls._fonts[key] = loader()
+            cls.loads += 1
+        return font
+
+
+class TextCache:
+    # LRU cache of rendered text surfaces keyed by (text, font, color, antialias)
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.TEXT_CACHE_SIZE
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text, font, color, antialias=True, alpha=None):
+        # alpha modulates the cached surface so pulsing text reuses one render
+        key = (text, font, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+        else:
+            self.misses += 1
+            surface = self.surfaces[key] = font.render(text, antialias, color)
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+                self.evictions += 1
+        surface.set_alpha(255 if alpha is None else alpha)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.surfaces),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fonts_loaded": Fonts.loads,
+        }
+
 
+class ParticleSpriteCache:
+    # Lazily rendered particle discs keyed by (color, quantized radius, quantized alpha),
+    # evicted least-recently-used first once max_entries is reached.
+    def __init__(self, max_entries=None, radius_step=None, alpha_levels=None):
+        self.max_entries = max_entries or Config.PARTICLE_SPRITE_CACHE_SIZE
+        self.radius_step = radius_step or Config.PARTICLE_RADIUS_STEP
+        self.alpha_levels = alpha_levels or Config.PARTICLE_ALPHA_LEVELS
+        self.sprites = OrderedDict()
+        self.atlas = {}  # Discs from the sprite atlas, never evicted
+        self.atlas_pending = []  # (atlas, page) of discs read on the first lookup
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load_atlas(self, atlas):
+        # Discs built for another radius step or alpha count would be keyed wrongly
+        if (atlas.radius_step, atlas.alpha_levels) == (self.radius_step, self.alpha_levels):
+            self.atlas_pending = [(atlas, index) for index, page in enumerate(atlas.pages)
+                                  if page[0] == SpriteAtlas.PARTICLE]
+
+    def load_atlas_pages(self):
+        pending, self.atlas_pending = self.atlas_pending, []
+        for atlas, index in pending:
+            for (radius_level, alpha_level, _, _, _, _, _, color), frame in atlas.frames(index):
+                self.atlas[(color, radius_level, alpha_level)] = frame
+
+    def get(self, color, radius_level, alpha_level):
+        # color is packed as 0xRRGGBB
+        key = (color, radius_level, alpha_level)
+        sprite = self.atlas.get(key)
+        if sprite is None and self.atlas_pending:
+            self.load_atlas_pages()
+            sprite = self.atlas.get(key)
+        if sprite is not None:
+            self.hits += 1
+            return sprite
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        radius = radius_level * self.radius_step
+        alpha = min(255, (alpha_level + 1) * 256 // self.alpha_levels)
+        rgba = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF, alpha)
+        size = int(math.ceil(radius * 2))
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, rgba, (size / 2, size / 2), radius)
+        sprite = prepare_surface(sprite)
+
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+            self.evictions += 1
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.sprites),
+            "atlas_entries": len(self.atlas),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ColumnStore:
+    # Base for structure-of-arrays stores: each live item is one row across a set
+    # of preallocated NumPy columns. Subclasses declare them in COLUMNS as
+    # (attribute, dtype) or (attribute, dtype, row length), in pack() order. Rows
+    # [0, count) are live, capacity grows by doubling, and removal compacts
+    # survivors to the front with a boolean mask.
+    COLUMNS = ()
+
+    def __init__(self, capacity):
+        self.count = 0
+        self.high_water = 0
+        self.grows = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        # Fresh zeroed columns; rows past count are never read
+        self.capacity = capacity
+        columns = []
+        for name, dtype, *row in self.COLUMNS:
+            column = np.zeros((capacity, *row), dtype=dtype)
+            setattr(self, name, column)
+            columns.append(column)
+        self.columns = tuple(columns)
+
+    def _columns(self):
+        return self.columns
+
+    def _reserve(self, extra):
+        needed = self.count + extra
+        self.high_water = max(self.high_water, needed)
+        if needed <= self.capacity:
+            return
+        self.grows += 1
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        old = self._columns()
+        self._allocate(capacity)
+        for new, column in zip(self._columns(), old):
+            new[:self.count] = column[:self.count]
+
+    def _compact(self, keep):
+        n = self.count
+        survivors = int(np.count_nonzero(keep))
+        if survivors != n:
+            for column in self._columns():
+                column[:survivors] = column[:n][keep]
+            self.count = survivors
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def pack(self):
+        # Live rows of every column, one column after another
+        return b"".join(column[:self.count].tobytes() for column in self._columns())
+
+    def unpack(self, data, count, offset=0):
+        # Inverse of pack(); returns the offset just past the rows read
+        self.count = 0
+        self._reserve(count)
+        for column in self._columns():
+            values = np.frombuffer(data, column.dtype, count * (column.size // len(column)), offset)
+            column[:count] = values.reshape((count,) + column.shape[1:]) if column.ndim > 1 else values
+            offset += values.nbytes
+        self.count = count
+        return offset
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "high_water": self.high_water,
+            "grows": self.grows,
+        }
 
-class Particle:
-    def __init__(self, x, y, color, velocity_x=0, velocity_y=0, size=5, life=None):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.velocity_x = velocity_x
-        self.velocity_y = velocity_y
-        self.size = size
-        self.initial_size = size
-        self.life = life if life else Config.PARTICLE_LIFE
-        self.max_life = self.life
+
+class ParticleSystem(ColumnStore):
+    # Every live particle is one row and the whole pool is advanced with a single
+    # vectorized step.
+    COLUMNS = (
+        ("x", np.float32),
+        ("y", np.float32),
+        ("velocity_x", np.float32),
+        ("velocity_y", np.float32),
+        ("size", np.float32),
+        ("initial_size", np.float32),
+        ("life", np.int32),
+        ("max_life", np.int32),
+        ("color", np.uint8, 3),
+    )
+
+    def __init__(self, capacity=256):
+        self.rng = np.random.default_rng()
+        self.sprites = ParticleSpriteCache()
+        super().__init__(capacity)
+
+    def emit(self, x, y, color, velocity_x=0, velocity_y=0, size=5, life=None):
+        self._reserve(1)
+        i = self.count
+        life = life if life else Config.PARTICLE_LIFE
+        self.x[i] = x
+        self.y[i] = y
+        self.velocity_x[i] = velocity_x
+        self.velocity_y[i] = velocity_y
+        self.size[i] = size
+        self.initial_size[i] = size
+        self.life[i] = life
+        self.max_life[i] = life
+        self.color[i] = color[:3]
+        self.count += 1
+
+    def emit_many(self, x, y, color, velocity_x, velocity_y, size, life=None):
+        # Emit a batch of particles; every argument may be a scalar (or one RGB
+        # color) or an array with one entry per particle.
+        velocity_x = np.asarray(velocity_x, dtype=np.float32)
+        n = velocity_x.size
+        if n == 0:
+            return
+        self._reserve(n)
+        start, end = self.count, self.count + n
+        life = life if life is not None else Config.PARTICLE_LIFE
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.velocity_x[start:end] = velocity_x
+        self.velocity_y[start:end] = velocity_y
+        self.size[start:end] = size
+        self.initial_size[start:end] = size
+        self.life[start:end] = life
+        self.max_life[start:end] = life
+        self.color[start:end] = np.asarray(color)[..., :3]
+        self.count = end
+
+    def burst(self, x, y, color, count, speed=(1, 5), size=(3, 8), life=(20, 40)):
+        # Radial explosion of `count` particles
+        angle = self.rng.uniform(0, 2 * math.pi, count)
+        velocity = self.rng.uniform(speed[0], speed[1], count)
+        self.emit_many(
+            x, y, color,
+            np.cos(angle) * velocity,
+            np.sin(angle) * velocity,
+            self.rng.integers(size[0], size[1], count, endpoint=True),
+            self.rng.integers(life[0], life[1], count, endpoint=True)
+        )
 
     def update(self):
-        self.x += self.velocity_x
-        self.y += self.velocity_y
-        self.life -= 1
-        self.size = self.initial_size * (self.life / self.max_life)
-        return self.life > 0
+        n = self.count
+        if n == 0:
+            return
+        self.x[:n] += self.velocity_x[:n]
+        self.y[:n] += self.velocity_y[:n]
+        self.life[:n] -= 1
+        self.size[:n] = self.initial_size[:n] * (self.life[:n] / self.max_life[:n])
+
+        # Compact surviving particles to the front of the pool
+        self._compact(self.life[:n] > 0)
+
+    def draw(self, screen, rects=None):
+        # Blitted regions are appended to rects when given
+        n = self.count
+        if n == 0:
+            return
+        cache = self.sprites
+        radius_levels = np.rint(self.size[:n] / cache.radius_step).astype(np.int32)
+        alpha_levels = (self.life[:n] * cache.alpha_levels // self.max_life[:n]).clip(0, cache.alpha_levels - 1)
+        colors = self.color[:n].astype(np.int32)
+        packed = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+        visible = radius_levels > 0
+        offsets = radius_levels[visible] * cache.radius_step
+        xs = (self.x[:n][visible] - offsets).tolist()
+        ys = (self.y[:n][visible] - offsets).tolist()
+        get = cache.get
+        drawn = screen.blits([
+            (get(color, radius, alpha), (x, y))
+            for color, radius, alpha, x, y in zip(packed[visible].tolist(), radius_levels[visible].tolist(),
+                                                   alpha_levels[visible].tolist(), xs, ys)
+        ], rects is not None)
+        if rects is not None:
+            rects.extend(drawn)
+
+
+class Starfield:
+    # Stars are baked once into a screen-sized tile per layer and twinkle group.
+    # Each frame blits every tile twice at its wrapping scroll offset with a
+    # surface alpha for the twinkle, so the cost does not grow with star count.
+    # Tiles are colorkeyed and RLE encoded, which keeps sparse blits cheap.
+    def __init__(self, width, height, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.ticks = 0
+        self.visible_layers = None  # Farthest layers drawn, None for all
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.size = (width, height)
+        count = int(width * height / 1e6 * Config.STARS_PER_MEGAPIXEL)
+        rng = self.rng
+        depth = rng.uniform(0.2, 1.0, count)
+        xs = rng.integers(0, width, count)
+        ys = rng.integers(0, height, count)
+        palette = np.array([Colors.OFF_WHITE, Colors.LIGHT_BLUE, Colors.MINT], dtype=np.uint8)
+        colors = palette[rng.integers(0, len(palette), count)]
+        groups = rng.integers(0, Config.STAR_TWINKLE_GROUPS, count)
+        layers = np.minimum(((depth - 0.2) / 0.8 * Config.STAR_LAYERS).astype(np.int64), Config.STAR_LAYERS - 1)
+
+        self.count = count
+        self.layers = []
+        for layer in range(Config.STAR_LAYERS):
+            # Same speed for a star's depth as before, 0.1 to 0.5 pixels a tick
+            speed = (0.2 + 0.8 * (layer + 0.5) / Config.STAR_LAYERS) * 0.5
+            dot = 2 if layer == Config.STAR_LAYERS - 1 else 1
+            tiles = []
+            for group in range(Config.STAR_TWINKLE_GROUPS):
+                selected = (layers == layer) & (groups == group)
+                phase = 2 * math.pi * group / Config.STAR_TWINKLE_GROUPS
+                tiles.append((self.bake(xs[selected], ys[selected], colors[selected], dot), phase))
+            self.layers.append([speed, 0.0, tiles])
+
+    def bake(self, xs, ys, colors, dot):
+        width, height = self.size
+        tile = pygame.Surface((width, height))
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        tile.fill((0, 0, 0))
+        pixels = pygame.surfarray.pixels3d(tile)
+        for dx in range(dot):
+            for dy in range(dot):
+                pixels[np.minimum(xs + dx, width - 1), np.minimum(ys + dy, height - 1)] = colors
+        del pixels
+        tile.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        return tile
 
-    def draw(self, screen):
-        alpha = int(255 * (self.life / self.max_life))
-        s = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
-        pygame.draw.circle(s, (*self.color[:3], alpha), (self.size, self.size), self.size)
-        screen.blit(s, (self.x - self.size, self.y - self.size))
+    def update(self):
+        self.ticks += 1
+        height = self.size[1]
+        for layer in self.layers:
+            layer[1] = (layer[1] + layer[0]) % height
+
+    def draw(self, surface):
+        height = self.size[1]
+        twinkle = self.ticks * 0.01
+        for _, offset, tiles in self.layers[:self.visible_layers]:
+            y = int(offset)
+            for tile, phase in tiles:
+                # Passing RLEACCEL again keeps the encoding; without it set_alpha drops it
+                tile.set_alpha(int(255 * (0.5 + 0.5 * math.sin(twinkle + phase))), pygame.RLEACCEL)
+                surface.blit(tile, (0, y))
+                surface.blit(tile, (0, y - height))
 
 
 class Player:
+    __slots__ = ("size", "speed", "velocity", "active_powers", "angle", "pulse", "pos", "prev_pos")
+
     def __init__(self):
         self.size = Config.PLAYER_SIZE
         self.speed = 10
         self.velocity = 0
-        self.trail = []
         self.active_powers = {
             PowerUpType.SHIELD: 0,
             PowerUpType.SLOW_TIME: 0,
@@ -110,7 +555,7 @@ class Player:
 
     def reset_position(self):
         self.pos = [Config.WIDTH // 2, Config.HEIGHT - 2 * self.size]
-        self.trail.clear()
+        self.prev_pos = list(self.pos)
         self.active_powers = {power: 0 for power in self.active_powers}
 
     def move(self, direction):
@@ -126,26 +571,9 @@ class Player:
         self.active_powers[power_type] = duration
 
     def update(self):
-        old_x = self.pos[0]
+        self.prev_pos[:] = self.pos
         self.pos[0] = max(0, min(Config.WIDTH - self.size, self.pos[0] + self.velocity))
         
-        # Add trail particles if moving
-        if abs(self.velocity) > 0 and random.random() < 0.3:
-            color = random.choice(Colors.PARTICLES)
-            self.trail.append(
-                Particle(
-                    self.pos[0] + self.size // 2,
-                    self.pos[1] + self.size // 2,
-                    color,
-                    random.uniform(-0.5, 0.5),
-                    random.uniform(-0.5, 3),
-                    random.randint(3, 6)
-                )
-            )
-        
-        # Update trail
-        self.trail = [p for p in self.trail if p.update()]
-        
         # Update power timers
         for power in list(self.active_powers.keys()):
             if self.active_powers[power] > 0:
@@ -155,74 +583,92 @@ class Player:
         self.angle = (self.angle + Config.ANIMATION_SPEED * abs(self.velocity) * 0.2) % 360
         self.pulse = (self.pulse + Config.ANIMATION_SPEED) % (2 * math.pi)
 
-    def draw(self, screen):
-        # Draw trail
-        for particle in self.trail:
-            particle.draw(screen)
-        
-        # Draw player shape
-        player_surface = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
+    def emit_trail(self, particles, chance=0.3):
+        # Add trail particles if moving
+        if abs(self.velocity) > 0 and random.random() < chance:
+            color = random.choice(Colors.PARTICLES)
+            particles.emit(
+                self.pos[0] + self.size // 2,
+                self.pos[1] + self.size // 2,
+                color,
+                random.uniform(-0.5, 0.5),
+                random.uniform(-0.5, 3),
+                random.randint(3, 6)
+            )
+
+    def draw(self, screen, sprites, alpha=1.0):
+        # alpha interpolates between the last two simulation ticks
+        x = self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha
+        y = self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha
+
+        # Change player color based on status
+        color = Colors.CORAL
+        if self.has_power(PowerUpType.SLOW_TIME):
+            color = Colors.LIGHT_BLUE
+        elif self.has_power(PowerUpType.MAGNET):
+            color = Colors.PURPLE
+
+        player_surface = sprites.player_frame(self.size, self.angle, self.pulse, color,
+                                              self.has_power(PowerUpType.SHIELD))
+        return screen.blit(player_surface, (x, y))
+
+    @staticmethod
+    def render(size, angle, pulse, color, shielded):
+        player_surface = pygame.Surface((size, size), pygame.SRCALPHA)
         
-        # Change player shape based on status
-        if self.has_power(PowerUpType.SHIELD):
+        if shielded:
             # Shield effect
-            shield_radius = self.size * 0.8 + math.sin(self.pulse) * 3
-            pygame.draw.circle(player_surface, Colors.SHIELD, (self.size // 2, self.size // 2), shield_radius)
+            shield_radius = size * 0.8 + math.sin(pulse) * 3
+            pygame.draw.circle(player_surface, Colors.SHIELD, (size // 2, size // 2), shield_radius)
         
         # Player shape with animation
-        pulse_size = 1 + math.sin(self.pulse) * 0.05  # Subtle pulsing effect
+        pulse_size = 1 + math.sin(pulse) * 0.05  # Subtle pulsing effect
         points = []
         for i in range(5):  # Star shape
-            angle_rad = math.radians(self.angle + i * 72)
-            radius = self.size // 2 * pulse_size
+            angle_rad = math.radians(angle + i * 72)
+            radius = size // 2 * pulse_size
             points.append((
-                self.size // 2 + math.cos(angle_rad) * radius,
-                self.size // 2 + math.sin(angle_rad) * radius
+                size // 2 + math.cos(angle_rad) * radius,
+                size // 2 + math.sin(angle_rad) * radius
             ))
-            angle_rad = math.radians(self.angle + i * 72 + 36)
-            inner_radius = self.size // 4 * pulse_size
+            angle_rad = math.radians(angle + i * 72 + 36)
+            inner_radius = size // 4 * pulse_size
             points.append((
-                self.size // 2 + math.cos(angle_rad) * inner_radius,
-                self.size // 2 + math.sin(angle_rad) * inner_radius
+                size // 2 + math.cos(angle_rad) * inner_radius,
+                size // 2 + math.sin(angle_rad) * inner_radius
             ))
         
-        # Draw the star shape
-        color = Colors.CORAL
-        if self.has_power(PowerUpType.SLOW_TIME):
-            color = Colors.LIGHT_BLUE
-        elif self.has_power(PowerUpType.MAGNET):
-            color = Colors.PURPLE
-        
         pygame.draw.polygon(player_surface, color, points)
         
         # Draw a smaller circle in the center
-        pygame.draw.circle(player_surface, Colors.OFF_WHITE, (self.size // 2, self.size // 2), self.size // 6)
-        
-        # Blit the player to the screen
-        screen.blit(player_surface, (self.pos[0], self.pos[1]))
+        pygame.draw.circle(player_surface, Colors.OFF_WHITE, (size // 2, size // 2), size // 6)
+        return player_surface
 
 
 class Block:
+    PARTICLE_COLORS = {
+        BlockType.NORMAL: Colors.TEAL,
+        BlockType.HARMFUL: Colors.RED,
+        BlockType.BONUS: Colors.GREEN,
+        BlockType.POWER_UP: Colors.GOLD,
+    }
+
+    __slots__ = ("size", "block_type", "angle", "rotation_speed", "pulse", "power_up_type",
+                 "pos", "prev_pos", "active", "scale")
+
     def __init__(self, block_type=None):
         self.size = Config.BLOCK_SIZE
-        self.block_type = block_type if block_type else self._random_type()
-        self.particles = []
-        self.angle = random.randint(0, 360)
-        self.rotation_speed = random.uniform(-2, 2)
-        self.pulse = random.uniform(0, 2 * math.pi)
-        self.power_up_type = None
-        
-        if self.block_type == BlockType.POWER_UP:
-            self.power_up_type = random.choice(list(PowerUpType))
-        
-        self.reset()
+        self.pos = [0, 0]
+        self.prev_pos = [0, 0]
+        self.reset(block_type)
 
-    def _random_type(self):
+    @staticmethod
+    def random_type(rng=random):
         # Determine block type based on probabilities
-        if random.random() < Config.POWER_UP_CHANCE:
+        if rng.random() < Config.POWER_UP_CHANCE:
             return BlockType.POWER_UP
         
-        r = random.random()
+        r = rng.random()
         if r < 0.7:  # 70% chance of normal block
             return BlockType.NORMAL
         elif r < 0.85:  # 15% chance of harmful block
@@ -230,9 +676,20 @@ class Block:
         else:  # 15% chance of bonus block
             return BlockType.BONUS
 
-    def reset(self):
-        self.pos = [random.randint(0, Config.WIDTH - self.size), -self.size]
-        self.particles.clear()
+    def reset(self, block_type=None, rng=random):
+        # Reinitialize in place so pooled blocks can be reused
+        self.block_type = block_type if block_type else self.random_type(rng)
+        self.angle = rng.randint(0, 360)
+        self.rotation_speed = rng.uniform(-2, 2)
+        self.pulse = rng.uniform(0, 2 * math.pi)
+        self.power_up_type = None
+        
+        if self.block_type == BlockType.POWER_UP:
+            self.power_up_type = rng.choice(POWER_UP_TYPES)
+        
+        self.pos[0] = rng.randint(0, Config.WIDTH - self.size)
+        self.pos[1] = -self.size
+        self.prev_pos[:] = self.pos
         self.active = True
         self.scale = 1.0  # For appearing/disappearing animation
 
@@ -246,161 +703,1468 @@ class Block:
         self.pos[1] += speed
         self.angle = (self.angle + self.rotation_speed) % 360
         self.pulse = (self.pulse + Config.ANIMATION_SPEED) % (2 * math.pi)
-        
-        # Update particles
-        self.particles = [p for p in self.particles if p.update()]
-        
+
+    def emit_exhaust(self, particles, chance=0.1):
         # Add particles based on block type
-        if random.random() < 0.1:
-            if self.block_type == BlockType.HARMFUL:
-                color = Colors.RED
-            elif self.block_type == BlockType.BONUS:
-                color = Colors.GREEN
-            elif self.block_type == BlockType.POWER_UP:
-                color = Colors.GOLD
-            else:
-                color = Colors.TEAL
-                
-            self.particles.append(
-                Particle(
-                    self.pos[0] + self.size // 2,
-                    self.pos[1] + self.size,
-                    color,
-                    random.uniform(-1, 1),
-                    random.uniform(1, 3),
-                    random.randint(2, 5)
-                )
+        if self.active and random.random() < chance:
+            particles.emit(
+                self.pos[0] + self.size // 2,
+                self.pos[1] + self.size,
+                self.PARTICLE_COLORS[self.block_type],
+                random.uniform(-1, 1),
+                random.uniform(1, 3),
+                random.randint(2, 5)
             )
 
     def is_off_screen(self):
         return self.pos[1] >= Config.HEIGHT
 
+    def is_finished(self):
+        # Deactivated and done with its shrink animation
+        return not self.active and self.scale <= 0
+
     def deactivate(self):
         self.active = False
-        # Create explosion particles
-        count = 20 if self.block_type == BlockType.POWER_UP else 10
-        
-        for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(1, 5)
-            
-            if self.block_type == BlockType.HARMFUL:
-                color = Colors.RED
-            elif self.block_type == BlockType.BONUS:
-                color = Colors.GREEN
-            elif self.block_type == BlockType.POWER_UP:
-                color = Colors.GOLD
-            else:
-                color = Colors.TEAL
-                
-            self.particles.append(
-                Particle(
-                    self.pos[0] + self.size // 2,
-                    self.pos[1] + self.size // 2,
-                    color,
-                    math.cos(angle) * speed,
-                    math.sin(angle) * speed,
-                    random.randint(3, 8),
-                    random.randint(20, 40)
-                )
-            )
 
-    def draw(self, screen):
-        # Draw particles
-        for particle in self.particles:
-            particle.draw(screen)
-            
+    def draw(self, screen, sprites, alpha=1.0):
         if self.scale <= 0:
             return
             
-        # Draw block with animation
-        block_surface = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
+        x = self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha
+        y = self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha
+        block_surface = sprites.block_frame(self.size, self.block_type, self.power_up_type,
+                                            self.angle, self.pulse, self.scale)
+        return screen.blit(block_surface, (
+            x + (self.size - block_surface.get_width()) // 2,
+            y + (self.size - block_surface.get_height()) // 2
+        ))
+
+    @staticmethod
+    def render(size, block_type, power_up_type, angle, pulse, scale, glow_rings=3):
+        block_surface = pygame.Surface((size, size), pygame.SRCALPHA)
         
         # Determine block shape and color based on type
-        if self.block_type == BlockType.NORMAL:
+        if block_type == BlockType.NORMAL:
             color = Colors.TEAL
             # Simple square with slight pulsing
-            size = int(self.size * self.scale * (0.9 + 0.1 * math.sin(self.pulse)))
+            shape_size = int(size * scale * (0.9 + 0.1 * math.sin(pulse)))
             pygame.draw.rect(
                 block_surface, 
                 color, 
-                (self.size // 2 - size // 2, self.size // 2 - size // 2, size, size)
+                (size // 2 - shape_size // 2, size // 2 - shape_size // 2, shape_size, shape_size)
             )
             
-        elif self.block_type == BlockType.HARMFUL:
+        elif block_type == BlockType.HARMFUL:
             color = Colors.RED
             # Spiky shape
             points = []
             num_points = 8
             for i in range(num_points * 2):
-                angle = math.radians(self.angle + i * 180 / num_points)
-                radius = self.size // 2 * self.scale if i % 2 == 0 else self.size // 3 * self.scale
+                angle_rad = math.radians(angle + i * 180 / num_points)
+                radius = size // 2 * scale if i % 2 == 0 else size // 3 * scale
                 points.append((
-                    self.size // 2 + math.cos(angle) * radius,
-                    self.size // 2 + math.sin(angle) * radius
+                    size // 2 + math.cos(angle_rad) * radius,
+                    size // 2 + math.sin(angle_rad) * radius
                 ))
             pygame.draw.polygon(block_surface, color, points)
             
-        elif self.block_type == BlockType.BONUS:
+        elif block_type == BlockType.BONUS:
             color = Colors.GREEN
             # Diamond shape
-            size = int(self.size * self.scale * (0.9 + 0.1 * math.sin(self.pulse)))
+            shape_size = int(size * scale * (0.9 + 0.1 * math.sin(pulse)))
             pygame.draw.polygon(
                 block_surface,
                 color,
                 [
-                    (self.size // 2, self.size // 2 - size // 2),
-                    (self.size // 2 + size // 2, self.size // 2),
-                    (self.size // 2, self.size // 2 + size // 2),
-                    (self.size // 2 - size // 2, self.size // 2)
+                    (size // 2, size // 2 - shape_size // 2),
+                    (size // 2 + shape_size // 2, size // 2),
+                    (size // 2, size // 2 + shape_size // 2),
+                    (size // 2 - shape_size // 2, size // 2)
                 ]
             )
             
-        elif self.block_type == BlockType.POWER_UP:
+        elif block_type == BlockType.POWER_UP:
             # Circle with glowing effect
-            pulse_radius = self.size // 2 * self.scale * (0.9 + 0.1 * math.sin(self.pulse))
+            pulse_radius = size // 2 * scale * (0.9 + 0.1 * math.sin(pulse))
             
             # Outer glow
-            for r in range(3):
+            for r in range(glow_rings):
                 alpha = 150 - r * 50
                 pygame.draw.circle(
                     block_surface, 
                     (255, 255, 200, alpha), 
-                    (self.size // 2, self.size // 2), 
+                    (size // 2, size // 2), 
                     pulse_radius + r * 2
                 )
             
-            if self.power_up_type == PowerUpType.SHIELD:
+            if power_up_type == PowerUpType.SHIELD:
                 color = Colors.LIGHT_BLUE
                 icon = "S"
-            elif self.power_up_type == PowerUpType.SLOW_TIME:
+            elif power_up_type == PowerUpType.SLOW_TIME:
                 color = Colors.PURPLE
                 icon = "T"
-            elif self.power_up_type == PowerUpType.MAGNET:
+            elif power_up_type == PowerUpType.MAGNET:
                 color = Colors.MINT
                 icon = "M"
-            elif self.power_up_type == PowerUpType.EXTRA_LIFE:
+            elif power_up_type == PowerUpType.EXTRA_LIFE:
                 color = Colors.CORAL
                 icon = "♥"
                 
-            pygame.draw.circle(block_surface, Colors.GOLD, (self.size // 2, self.size // 2), pulse_radius)
-            pygame.draw.circle(block_surface, Colors.OFF_WHITE, (self.size // 2, self.size // 2), pulse_radius * 0.7)
+            pygame.draw.circle(block_surface, Colors.GOLD, (size // 2, size // 2), pulse_radius)
+            pygame.draw.circle(block_surface, Colors.OFF_WHITE, (size // 2, size // 2), pulse_radius * 0.7)
             
             # Draw power-up icon
-            font = pygame.font.SysFont("arial", int(self.size // 2 * self.scale))
+            font = Fonts.system("arial", int(size // 2 * scale))
             text = font.render(icon, True, color)
-            text_rect = text.get_rect(center=(self.size // 2, self.size // 2))
+            text_rect = text.get_rect(center=(size // 2, size // 2))
             block_surface.blit(text, text_rect)
             
         # Apply rotation if needed
-        if self.rotation_speed != 0 and self.block_type != BlockType.POWER_UP:
-            block_surface = pygame.transform.rotate(block_surface, self.angle)
-            
-        # Blit the block to the screen
-        screen.blit(block_surface, (
-            self.pos[0] + (self.size - block_surface.get_width()) // 2,
-            self.pos[1] + (self.size - block_surface.get_height()) // 2
-        ))
+        if block_type != BlockType.POWER_UP:
+            block_surface = pygame.transform.rotate(block_surface, angle)
+        return block_surface
+
+
+class BlockStore(ColumnStore):
+    # Array-backed falling blocks for the Simulation. Types are stored by enum
+    # value (power_up_type is 0 for none).
+    BLOCK_TYPES = {block_type.value: block_type for block_type in BlockType}
+    POWER_UP_TYPES = {0: None, **{power.value: power for power in PowerUpType}}
+    COLUMNS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("prev_x", np.float64),
+        ("prev_y", np.float64),
+        ("angle", np.float64),
+        ("rotation_speed", np.float64),
+        ("pulse", np.float64),
+        ("scale", np.float64),
+        ("block_type", np.int8),
+        ("power_up_type", np.int8),
+        ("active", bool),
+    )
+
+    def __init__(self, capacity=64):
+        self.size = Config.BLOCK_SIZE
+        super().__init__(capacity)
+
+    def append(self, x, y, block_type, power_up_type, angle, rotation_speed, pulse):
+        self._reserve(1)
+        i = self.count
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.angle[i] = angle
+        self.rotation_speed[i] = rotation_speed
+        self.pulse[i] = pulse
+        self.scale[i] = 1.0
+        self.block_type[i] = block_type.value
+        self.power_up_type[i] = power_up_type.value if power_up_type else 0
+        self.active[i] = True
+        self.count += 1
+        return i
+
+    def type_of(self, row):
+        return self.BLOCK_TYPES[int(self.block_type[row])]
+
+    def power_up_of(self, row):
+        return self.POWER_UP_TYPES[int(self.power_up_type[row])]
+
+
+class Simulation:
+    # Game rules without any display, particles or sound: player movement, block
+    # spawning and falling, magnet, collisions, scoring, lives and power-up timers.
+    # Each call to step() advances one tick for the given Action and returns the
+    # events that happened during it, which a renderer can turn into effects.
+    # Every random decision comes from self.rng, so the seed plus the actions
+    # of each tick reproduce a session exactly.
+    #
+    # snapshot() captures all of that state in one flat buffer: the STATE header
+    # (playfield size, counters, player, power-up timers), the RNG's Mersenne
+    # Twister words, then the live block rows.
+    STATE = struct.Struct("<iiIIiiid???ddddddddiiiI")
+    RNG_STATE = struct.Struct("<625I")
+    TIMED_POWERS = (PowerUpType.SHIELD, PowerUpType.SLOW_TIME, PowerUpType.MAGNET)
+
+    def __init__(self, profiler=None):
+        self.player = Player()
+        self.blocks = BlockStore()
+        self.events = []
+        self.profiler = profiler if profiler is not None else DummyProfiler()
+        self.rng = random.Random()
+        self.reset()
+
+    def reset(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng.seed(self.seed)
+        self.player.reset_position()
+        self.player.stop()
+        self.blocks.clear()
+        self.events.clear()
+        self.score = 0
+        self.speed = Config.INITIAL_SPEED
+        self.lives = Config.LIVES
+        self.magnet_enabled = False
+        self.slow_mo_factor = 1.0
+        self.game_over = False
+        self.ticks = 0
+
+    def step(self, action=Action.STOP):
+        self.events = events = []
+        if self.game_over:
+            return events
+
+        player = self.player
+        profiler = self.profiler
+        with profiler.section("sim.player"):
+            if action == Action.STOP:
+                player.stop()
+            else:
+                player.move(action.value)
+
+            # Check player power-ups
+            self.slow_mo_factor = 0.5 if player.has_power(PowerUpType.SLOW_TIME) else 1.0
+            self.magnet_enabled = player.has_power(PowerUpType.MAGNET)
+
+            player.update()
+
+        # Spawn new blocks
+        with profiler.section("sim.spawn"):
+            if len(self.blocks) < Config.MAX_BLOCKS and self.rng.random() < Config.BLOCK_SPAWN_RATE * self.slow_mo_factor:
+                self.spawn()
+
+        blocks = self.blocks
+        with profiler.section("sim.blocks"):
+            n = blocks.count
+            # A handful of blocks is cheaper in plain Python than in a dozen
+            # NumPy calls; both paths compute the same floats
+            scalar = n < Config.SIM_VECTOR_MIN_BLOCKS
+            if scalar and n:
+                self.update_blocks_scalar(n)
+            elif n:
+                self.update_blocks(n)
+
+        # Check for collisions with player
+        with profiler.section("sim.collisions"):
+            px, py, size = player.pos[0], player.pos[1], player.size
+            block_size = blocks.size
+            if scalar:
+                n = blocks.count
+                hits = [row for row, (bx, by, active) in enumerate(zip(blocks.x[:n].tolist(), blocks.y[:n].tolist(),
+                                                                       blocks.active[:n].tolist()))
+                        if active and px < bx + block_size and bx < px + size and py < by + block_size and by < py + size]
+            else:
+                rows = np.flatnonzero(blocks.active[:blocks.count])
+                bx, by = blocks.x[rows], blocks.y[rows]
+                hit = (px < bx + block_size) & (bx < px + size) & (py < by + block_size) & (by < py + size)
+                hits = rows[hit].tolist()
+            for row in hits:
+                self.collect(row)
+                if self.game_over:
+                    break
+
+        # Update speed based on score, but cap it
+        self.speed = min(Config.INITIAL_SPEED + (self.score // 15), 15)
+        self.ticks += 1
+        return events
+
+    def update_blocks(self, n):
+        # One vectorized pass over every block: magnet, fall, animation, scoring
+        # for dodged harmful blocks and removal of finished ones.
+        blocks = self.blocks
+        x, y = blocks.x[:n], blocks.y[:n]
+        active = blocks.active[:n]
+        blocks.prev_x[:n] = x
+        blocks.prev_y[:n] = y
+
+        # Apply magnet effect to nearby bonus items
+        if self.magnet_enabled:
+            self.apply_magnet(x, y)
+
+        # Active blocks fall and animate
+        y += active * (self.speed * self.slow_mo_factor)
+        angle = blocks.angle[:n]
+        angle += blocks.rotation_speed[:n] * active
+        np.remainder(angle, 360, out=angle)
+        pulse = blocks.pulse[:n]
+        pulse += active * Config.ANIMATION_SPEED
+        np.remainder(pulse, 2 * math.pi, out=pulse)
+
+        removed = y >= Config.HEIGHT
+        if not active.all():
+            # Collected blocks shrink away
+            scale = blocks.scale[:n]
+            scale -= 0.1 * ~active
+            np.maximum(scale, 0, out=scale)
+            removed |= scale <= 0
+
+        if removed.any():
+            dodged = removed & active & (blocks.block_type[:n] == BlockType.HARMFUL.value)
+            # Score points for letting harmful blocks pass, once per block
+            half = blocks.size // 2
+            for bx in x[dodged].tolist():
+                self.score += 2
+                self.events.append((SimEvent.DODGE, bx + half, Config.HEIGHT, BlockType.HARMFUL))
+            blocks._compact(~removed)
+
+    def update_blocks_scalar(self, n):
+        # update_blocks() one row at a time over plain lists, for the few blocks
+        # of a normal game. Same operations in the same order, so same results;
+        # collected blocks only shrink since adding 0 leaves the rest unchanged.
+        blocks = self.blocks
+        blocks.prev_x[:n] = blocks.x[:n]
+        blocks.prev_y[:n] = blocks.y[:n]
+        xs, ys = blocks.x[:n].tolist(), blocks.y[:n].tolist()
+        angles, pulses, scales = blocks.angle[:n].tolist(), blocks.pulse[:n].tolist(), blocks.scale[:n].tolist()
+        types = blocks.block_type[:n].tolist()
+
+        magnet = self.magnet_enabled
+        if magnet:
+            player = self.player
+            player_cx = player.pos[0] + player.size // 2
+            player_cy = player.pos[1] + player.size // 2
+            radius = Config.MAGNET_RADIUS
+            pulled_types = (BlockType.BONUS.value, BlockType.POWER_UP.value)
+        fall = self.speed * self.slow_mo_factor
+        spin, full_turn = Config.ANIMATION_SPEED, 2 * math.pi
+        height = Config.HEIGHT
+        harmful = BlockType.HARMFUL.value
+        half = blocks.size // 2
+        removed = []
+        for row, (rotation_speed, active) in enumerate(zip(blocks.rotation_speed[:n].tolist(),
+                                                           blocks.active[:n].tolist())):
+            if not active:
+                # Collected blocks shrink away
+                scale = scales[row] = max(scales[row] - 0.1, 0)
+                if scale <= 0 or ys[row] >= height:
+                    removed.append(row)
+                continue
+
+            x, y = xs[row], ys[row]
+            # Apply magnet effect to nearby bonus items
+            if magnet and types[row] in pulled_types:
+                dx = player_cx - (x + half)
+                dy = player_cy - (y + half)
+                distance = math.sqrt(dx * dx + dy * dy)
+                if 0 < distance < radius:
+                    attraction = 5 * (1 - distance / radius)
+                    x = xs[row] = x + dx / distance * attraction
+                    y += dy / distance * attraction
+
+            # Active blocks fall and animate
+            y = ys[row] = y + fall
+            angles[row] = (angles[row] + rotation_speed) % 360
+            pulses[row] = (pulses[row] + spin) % full_turn
+            if y >= height:
+                removed.append(row)
+                if types[row] == harmful:
+                    # Score points for letting harmful blocks pass, once per block
+                    self.score += 2
+                    self.events.append((SimEvent.DODGE, x + half, height, BlockType.HARMFUL))
+
+        if magnet:
+            blocks.x[:n] = xs
+        blocks.y[:n] = ys
+        blocks.angle[:n] = angles
+        blocks.pulse[:n] = pulses
+        blocks.scale[:n] = scales
+        if removed:
+            keep = np.ones(n, dtype=bool)
+            keep[removed] = False
+            blocks._compact(keep)
+
+    def apply_magnet(self, x, y):
+        blocks = self.blocks
+        player = self.player
+        player_cx = player.pos[0] + player.size // 2
+        player_cy = player.pos[1] + player.size // 2
+        n = blocks.count
+        block_type = blocks.block_type[:n]
+        rows = np.flatnonzero(blocks.active[:n] & ((block_type == BlockType.BONUS.value) |
+                                                   (block_type == BlockType.POWER_UP.value)))
+        if rows.size == 0:
+            return
+
+        # Vector from block to player
+        half = blocks.size // 2
+        dx = player_cx - (x[rows] + half)
+        dy = player_cy - (y[rows] + half)
+        distance = np.sqrt(dx * dx + dy * dy)
+        pulled = (distance > 0) & (distance < Config.MAGNET_RADIUS)
+        rows, dx, dy, distance = rows[pulled], dx[pulled], dy[pulled], distance[pulled]
+
+        # Normalize and apply attraction
+        attraction = 5 * (1 - distance / Config.MAGNET_RADIUS)
+        x[rows] += dx / distance * attraction
+        y[rows] += dy / distance * attraction
+
+    def spawn(self, block_type=None):
+        rng = self.rng
+        block_type = block_type or Block.random_type(rng)
+        angle = rng.randint(0, 360)
+        rotation_speed = rng.uniform(-2, 2)
+        pulse = rng.uniform(0, 2 * math.pi)
+        power_up_type = rng.choice(POWER_UP_TYPES) if block_type == BlockType.POWER_UP else None
+        x = rng.randint(0, Config.WIDTH - Config.BLOCK_SIZE)
+        y = -Config.BLOCK_SIZE
+
+        return self.blocks.append(x, y, block_type, power_up_type, angle, rotation_speed, pulse)
+
+    def resize(self, width, height):
+        # The playfield follows the window; keep the player's relative position
+        scale_x = width / Config.WIDTH
+        Config.WIDTH = width
+        Config.HEIGHT = height
+        player = self.player
+        player.pos[0] *= scale_x
+        player.pos[1] = Config.HEIGHT - 2 * player.size
+        player.prev_pos[:] = player.pos
+
+    def snapshot(self):
+        player = self.player
+        version, words, gauss = self.rng.getstate()
+        powers = player.active_powers
+        header = self.STATE.pack(
+            Config.WIDTH, Config.HEIGHT, self.seed, self.ticks, self.score, self.lives,
+            self.speed, self.slow_mo_factor, self.magnet_enabled, self.game_over, gauss is not None, gauss or 0.0,
+            player.pos[0], player.pos[1], player.prev_pos[0], player.prev_pos[1], player.velocity,
+            player.angle, player.pulse, *(powers[power] for power in self.TIMED_POWERS), self.blocks.count)
+        return header + self.RNG_STATE.pack(*words) + self.blocks.pack()
+
+    def restore(self, data):
+        (width, height, self.seed, self.ticks, self.score, self.lives,
+         self.speed, self.slow_mo_factor, self.magnet_enabled, self.game_over, has_gauss, gauss,
+         x, y, prev_x, prev_y, velocity, angle, pulse, *timers, count) = self.STATE.unpack_from(data)
+        Config.WIDTH, Config.HEIGHT = width, height
+        offset = self.STATE.size
+        self.rng.setstate((3, self.RNG_STATE.unpack_from(data, offset), gauss if has_gauss else None))
+        offset += self.RNG_STATE.size
+
+        player = self.player
+        player.pos[:] = (x, y)
+        player.prev_pos[:] = (prev_x, prev_y)
+        player.velocity, player.angle, player.pulse = velocity, angle, pulse
+        player.active_powers.update(zip(self.TIMED_POWERS, timers))
+
+        self.blocks.unpack(data, count, offset)
+        self.events = []
+
+    def clone(self):
+        sim = Simulation(self.profiler)
+        sim.restore(self.snapshot())
+        return sim
+
+    def collect(self, row):
+        blocks = self.blocks
+        block_type = blocks.type_of(row)
+        bx, by = float(blocks.x[row]), float(blocks.y[row])
+        half = blocks.size // 2
+        blocks.active[row] = False
+        self.events.append((SimEvent.COLLECT, bx + half, by + half, block_type))
+
+        if block_type == BlockType.HARMFUL:
+            # A shield absorbs the hit
+            if not self.player.has_power(PowerUpType.SHIELD):
+                self.lives -= 1
+                self.events.append((SimEvent.HIT, bx, by, block_type))
+                if self.lives <= 0:
+                    self.game_over = True
+                    self.events.append((SimEvent.GAME_OVER, bx, by, block_type))
+
+        elif block_type == BlockType.NORMAL:
+            self.score += 1
+
+        elif block_type == BlockType.BONUS:
+            self.score += 5
+
+        elif block_type == BlockType.POWER_UP:
+            power_up_type = blocks.power_up_of(row)
+            if power_up_type == PowerUpType.SHIELD:
+                self.player.activate_power(PowerUpType.SHIELD, Config.SHIELD_DURATION)
+            elif power_up_type == PowerUpType.SLOW_TIME:
+                self.player.activate_power(PowerUpType.SLOW_TIME, Config.SLOW_TIME_DURATION)
+            elif power_up_type == PowerUpType.MAGNET:
+                self.player.activate_power(PowerUpType.MAGNET, Config.MAGNET_DURATION)
+            elif power_up_type == PowerUpType.EXTRA_LIFE:
+                self.lives = min(self.lives + 1, 5)  # Cap at 5 lives
+
+
+class Replay:
+    # A recorded session: the Simulation seed and window size, then the inputs as
+    # (ticks since the previous event, code[, payload]) with every number a
+    # varint. Only changes are stored, so minutes of play take a few hundred bytes.
+    MAGIC = b"FBR1"
+    STOP, LEFT, RIGHT, PAUSE, RESUME, RESIZE, END = range(7)
+    ACTIONS = {STOP: Action.STOP, LEFT: Action.LEFT, RIGHT: Action.RIGHT}
+    ACTION_CODES = {action: code for code, action in ACTIONS.items()}
+
+    def __init__(self, seed, width, height):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.events = []  # (tick, code, payload)
+        self.ticks = 0
+        self.score = None
+        self.lives = None
+        # Recording state
+        self.action = Action.STOP
+        self.paused = False
+
+    # Recording
+
+    def record(self, action, paused):
+        # Called once per tick with the input that tick runs with
+        if paused != self.paused:
+            self.paused = paused
+            self.events.append((self.ticks, self.PAUSE if paused else self.RESUME, None))
+        if action != self.action:
+            self.action = action
+            self.events.append((self.ticks, self.ACTION_CODES[action], None))
+        self.ticks += 1
+
+    def record_resize(self, width, height):
+        self.events.append((self.ticks, self.RESIZE, (width, height)))
+
+    def finish(self, score, lives):
+        self.score = score
+        self.lives = lives
+
+    # Playback
+
+    def inputs(self):
+        # Yields (action, paused, new window size or None) for every tick
+        action, paused = Action.STOP, False
+        events = iter(self.events)
+        pending = next(events, None)
+        for tick in range(self.ticks):
+            size = None
+            while pending is not None and pending[0] == tick:
+                _, code, payload = pending
+                if code in self.ACTIONS:
+                    action = self.ACTIONS[code]
+                elif code == self.PAUSE or code == self.RESUME:
+                    paused = code == self.PAUSE
+                elif code == self.RESIZE:
+                    size = payload
+                pending = next(events, None)
+            yield action, paused, size
+
+    # Encoding
+
+    @staticmethod
+    def write_varint(out, value):
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def read_varint(data, pos):
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+
+    def to_bytes(self):
+        out = bytearray(self.MAGIC)
+        write = self.write_varint
+        for value in (self.seed, self.width, self.height):
+            write(out, value)
+        last = 0
+        for tick, code, payload in self.events:
+            write(out, tick - last)
+            out.append(code)
+            if code == self.RESIZE:
+                write(out, payload[0])
+                write(out, payload[1])
+            last = tick
+        write(out, self.ticks - last)
+        out.append(self.END)
+        write(out, self.score or 0)
+        write(out, self.lives or 0)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError("Not a Falling Blocks replay")
+        read = cls.read_varint
+        pos = len(cls.MAGIC)
+        seed, pos = read(data, pos)
+        width, pos = read(data, pos)
+        height, pos = read(data, pos)
+        replay = cls(seed, width, height)
+        tick = 0
+        while True:
+            delta, pos = read(data, pos)
+            tick += delta
+            code = data[pos]
+            pos += 1
+            if code == cls.END:
+                replay.ticks = tick
+                replay.score, pos = read(data, pos)
+                replay.lives, pos = read(data, pos)
+                return replay
+            payload = None
+            if code == cls.RESIZE:
+                new_width, pos = read(data, pos)
+                new_height, pos = read(data, pos)
+                payload = (new_width, new_height)
+            replay.events.append((tick, code, payload))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class SpriteAtlas:
+    # Frames pre-rendered by build_atlas.py, on pages: one image per block type,
+    # per player color and shield, and one for the particle discs. <path>.idx
+    # holds the page table and where each frame sits on its page; <path>.pix
+    # holds the pages, each zlib-compressed 32-bit pixels in the display's usual
+    # ARGB layout, so a page loads with one decompress and its surface wraps
+    # those bytes as they are; frames are subsurfaces of it, not copies. PNG
+    # would need a decode and a conversion, about three times as long.
+    # Only the index is read at startup. A page is inflated when a cache first
+    # needs a frame from it, so no frame waits for pixels it does not draw.
+    # load() returns None when the index is missing or damaged, a page that
+    # cannot be read yields no frames, and the caches then render at runtime.
+    MAGIC = b"FBS2"
+    # magic, pulse steps, scale steps, particle radius step, particle alpha
+    # levels, page count, record count, crc of the records; then a PAGE per
+    # page and the records, grouped by page and zlib compressed
+    HEADER = struct.Struct("<4sHHHHHII")
+    # kind, variant, color, width, height, first record and record count, then
+    # offset and length of the compressed pixels in .pix
+    PAGE = struct.Struct("<BBIHHIIII")
+    BLOCK, PLAYER, PARTICLE = range(3)
+    # Fields by kind:      block          player      particle
+    #   size               size           size        radius level
+    #   variant            block type     shielded    alpha level
+    #   power_up           power-up or 0
+    #   angle, pulse       angle, step    angle, step
+    #   scale, glow        step, rings
+    #   color                             0xRRGGBB    0xRRGGBB
+    #   x, y, w, h         rectangle on its page
+    RECORD = np.dtype([
+        ("kind", "u1"),
+        ("size", "u1"),
+        ("variant", "u1"),
+        ("power_up", "u1"),
+        ("angle", "<u2"),
+        ("pulse", "u1"),
+        ("scale", "u1"),
+        ("glow", "u1"),
+        ("color", "<u4"),
+        ("x", "<u2"),
+        ("y", "<u2"),
+        ("w", "<u2"),
+        ("h", "<u2"),
+    ])
+
+    def __init__(self, path, pages, records, pulse_steps, scale_steps, radius_step, alpha_levels):
+        self.path = path
+        self.pages = pages
+        self.images = {}  # Inflated pages by index, None for one that could not be read
+        self.pixels = {}  # The page surfaces borrow these bytes
+        self.records = records
+        self.pulse_steps = pulse_steps
+        self.scale_steps = scale_steps
+        self.radius_step = radius_step
+        self.alpha_levels = alpha_levels
+
+    @classmethod
+    def page_key(cls, kind, variant, color):
+        # Blocks are paged by type and the player by shield and color, so a game
+        # only inflates what it shows; particle discs are small and share a page
+        return (kind, 0, 0) if kind == cls.PARTICLE else (kind, variant, color)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path + ".idx", "rb") as f:
+                data = f.read()
+            (magic, pulse_steps, scale_steps, radius_step, alpha_levels, page_count,
+             count, crc) = cls.HEADER.unpack_from(data)
+            if magic != cls.MAGIC:
+                return None
+            offset = cls.HEADER.size
+            pages = [cls.PAGE.unpack_from(data, offset + i * cls.PAGE.size) for i in range(page_count)]
+            body = zlib.decompress(data[offset + page_count * cls.PAGE.size:])
+        except (OSError, struct.error, zlib.error):
+            return None
+        if len(body) != count * cls.RECORD.itemsize or zlib.crc32(body) != crc:
+            return None
+        return cls(path, pages, np.frombuffer(body, dtype=cls.RECORD),
+                   pulse_steps, scale_steps, radius_step, alpha_levels)
+
+    @classmethod
+    def save(cls, path, pages, pulse_steps, scale_steps, radius_step, alpha_levels):
+        # pages holds (page key, image, records) with record rectangles on that image
+        records = np.concatenate([page_records for _, _, page_records in pages]).astype(cls.RECORD)
+        body = records.tobytes()
+        header = cls.HEADER.pack(cls.MAGIC, pulse_steps, scale_steps, radius_step, alpha_levels,
+                                 len(pages), len(records), zlib.crc32(body))
+        streams = []
+        first = offset = 0
+        for (kind, variant, color), image, page_records in pages:
+            stream = zlib.compress(pygame.image.tobytes(image, "BGRA"), 9)
+            header += cls.PAGE.pack(kind, variant, color, *image.get_size(), first, len(page_records),
+                                    offset, len(stream))
+            streams.append(stream)
+            first += len(page_records)
+            offset += len(stream)
+        with open(path + ".pix", "wb") as f:
+            f.write(b"".join(streams))
+        with open(path + ".idx", "wb") as f:
+            f.write(header + zlib.compress(body, 9))
+
+    def page(self, index):
+        # The page's image, inflated on first use
+        if index not in self.images:
+            _, _, _, width, height, _, _, offset, length = self.pages[index]
+            try:
+                with open(self.path + ".pix", "rb") as f:
+                    f.seek(offset)
+                    pixels = zlib.decompress(f.read(length))
+            except (OSError, zlib.error):
+                pixels = b""
+            image = None
+            if pixels and len(pixels) == width * height * 4:
+                self.pixels[index] = pixels
+                image = pygame.image.frombuffer(pixels, (width, height), "BGRA")
+            self.images[index] = image
+        return self.images[index]
+
+    def frames(self, index):
+        # (size, variant, power_up, angle, pulse, scale, glow, color) and the frame, for each record of a page
+        image = self.page(index)
+        if image is None:
+            return
+        first, count = self.pages[index][5:7]
+        records = self.records[first:first + count]
+        fields = [records[name].tolist() for name in
+                  ("size", "variant", "power_up", "angle", "pulse", "scale", "glow", "color")]
+        subsurface = image.subsurface
+        for key, x, y, w, h in zip(zip(*fields), records["x"].tolist(), records["y"].tolist(),
+                                   records["w"].tolist(), records["h"].tolist()):
+            yield key, subsurface((x, y, w, h))
+
+
+class SpriteCache:
+    # Pre-rendered Block and Player frames at quantized rotation angles, pulse
+    # phases and scales. Frames are built on first use (or up front via prewarm)
+    # and evicted least-recently-used first once max_bytes is exceeded.
+
+    # Rotational symmetry of each shape in degrees
+    BLOCK_SYMMETRY = {
+        BlockType.NORMAL: 90,
+        BlockType.HARMFUL: 360,
+        BlockType.BONUS: 90,
+        BlockType.POWER_UP: 360,
+    }
+    PLAYER_SYMMETRY = 72
+
+    def __init__(self, angle_step=None, pulse_steps=None, scale_steps=None, max_bytes=None):
+        self.angle_step = angle_step or Config.SPRITE_ANGLE_STEP
+        self.pulse_steps = pulse_steps or Config.SPRITE_PULSE_STEPS
+        self.scale_steps = scale_steps or Config.SPRITE_SCALE_STEPS
+        self.max_bytes = max_bytes or Config.SPRITE_CACHE_MAX_BYTES
+        self.glow_rings = 3  # Power-up glow passes, lowered by the quality governor
+        self.frames = OrderedDict()
+        self.atlas = {}  # Frames from the sprite atlas, never evicted
+        self.atlas_pending = {}  # ("block", type) or ("player", color, shielded) -> (atlas, page) not read yet
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _angle(self, angle, symmetry):
+        return round((angle % symmetry) / self.angle_step) * self.angle_step % symmetry
+
+    def _pulse(self, pulse):
+        step = round(pulse / (2 * math.pi) * self.pulse_steps) % self.pulse_steps
+        return step * 2 * math.pi / self.pulse_steps
+
+    def _scale(self, scale):
+        return round(scale * self.scale_steps) / self.scale_steps
+
+    def _lookup(self, key, page, render, *args):
+        frame = self.atlas.get(key)
+        if frame is None and page in self.atlas_pending:
+            self.load_atlas_page(page)
+            frame = self.atlas.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            self.frames.move_to_end(key)
+            return frame
+
+        self.misses += 1
+        frame = prepare_surface(render(*args))
+        self.frames[key] = frame
+        self.bytes += frame.get_width() * frame.get_height() * frame.get_bytesize()
+        while self.bytes > self.max_bytes and len(self.frames) > 1:
+            _, evicted = self.frames.popitem(last=False)
+            self.bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+            self.evictions += 1
+        return frame
+
+    def block_frame(self, size, block_type, power_up_type, angle, pulse, scale):
+        # Power-ups are not rotated and harmful blocks do not pulse
+        angle = 0 if block_type == BlockType.POWER_UP else self._angle(angle, self.BLOCK_SYMMETRY[block_type])
+        pulse = 0 if block_type == BlockType.HARMFUL else self._pulse(pulse)
+        scale = self._scale(scale)
+        glow_rings = self.glow_rings if block_type == BlockType.POWER_UP else 0
+        key = ("block", size, block_type, power_up_type, angle, pulse, scale, glow_rings)
+        return self._lookup(key, ("block", block_type), Block.render, size, block_type, power_up_type, angle, pulse, scale, glow_rings)
+
+    def player_frame(self, size, angle, pulse, color, shielded):
+        angle = self._angle(angle, self.PLAYER_SYMMETRY)
+        pulse = self._pulse(pulse)
+        key = ("player", size, angle, pulse, color, shielded)
+        return self._lookup(key, ("player", color, shielded), Player.render, size, angle, pulse, color, shielded)
+
+    def load_atlas(self, atlas):
+        # Pulses and scales are stored as steps, so they only match the same step counts
+        if (atlas.pulse_steps, atlas.scale_steps) != (self.pulse_steps, self.scale_steps):
+            return
+        for index, (kind, variant, color, *_) in enumerate(atlas.pages):
+            if kind == SpriteAtlas.BLOCK:
+                self.atlas_pending[("block", BlockType(variant))] = (atlas, index)
+            elif kind == SpriteAtlas.PLAYER:
+                color = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+                self.atlas_pending[("player", color, bool(variant))] = (atlas, index)
+
+    def load_atlas_page(self, page):
+        atlas, index = self.atlas_pending.pop(page)
+        if page[0] == "block":
+            for (size, block_type, power_up_type, angle, pulse, scale, glow_rings, _), frame in \
+                    atlas.frames(index):
+                block_type = BlockType(block_type)
+                power_up_type = PowerUpType(power_up_type) if power_up_type else None
+                pulse = pulse * 2 * math.pi / self.pulse_steps
+                scale = scale / self.scale_steps
+                self.atlas[("block", size, block_type, power_up_type, angle, pulse, scale, glow_rings)] = frame
+        else:
+            for (size, shielded, _, angle, pulse, _, _, color), frame in atlas.frames(index):
+                color = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+                pulse = pulse * 2 * math.pi / self.pulse_steps
+                self.atlas[("player", size, angle, pulse, color, bool(shielded))] = frame
+
+    def prewarm(self):
+        pulses = [i * 2 * math.pi / self.pulse_steps for i in range(self.pulse_steps)]
+        for block_type in BlockType:
+            power_up_types = list(PowerUpType) if block_type == BlockType.POWER_UP else [None]
+            angles = range(0, self.BLOCK_SYMMETRY[block_type], self.angle_step) \
+                if block_type != BlockType.POWER_UP else [0]
+            for power_up_type in power_up_types:
+                for angle in angles:
+                    for pulse in (pulses if block_type != BlockType.HARMFUL else [0]):
+                        self.block_frame(Config.BLOCK_SIZE, block_type, power_up_type, angle, pulse, 1.0)
+        for color in (Colors.CORAL, Colors.LIGHT_BLUE, Colors.PURPLE):
+            for shielded in (False, True):
+                for angle in range(0, self.PLAYER_SYMMETRY, self.angle_step):
+                    for pulse in pulses:
+                        self.player_frame(Config.PLAYER_SIZE, angle, pulse, color, shielded)
+
+    def clear(self):
+        self.frames.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "frames": len(self.frames),
+            "atlas_frames": len(self.atlas),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class BlockPool:
+    # Free list of Block objects recycled through Block.reset
+    def __init__(self):
+        self.free = []
+        self.created = 0
+        self.in_use = 0
+        self.high_water = 0
+
+    def acquire(self, block_type=None):
+        if self.free:
+            block = self.free.pop()
+            block.reset(block_type)
+        else:
+            block = Block(block_type)
+            self.created += 1
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return block
+
+    def release(self, block):
+        self.in_use -= 1
+        self.free.append(block)
+
+    def stats(self):
+        return {
+            "in_use": self.in_use,
+            "free": len(self.free),
+            "created": self.created,
+            "high_water": self.high_water,
+        }
+
+
+class DirtyRectRenderer:
+    # Opt-in presentation mode for software-rendered targets. The screen outside
+    # the rects drawn last frame always equals a cached background, so a frame
+    # only restores those rects, redraws, and returns old + new rects for the
+    # caller to push with pygame.display.update. Static screens pass a
+    # signature; an unchanged signature skips the frame entirely, and a change
+    # that only affects pulsing text or the HUD heart pushes just those rects.
+    def __init__(self):
+        self.background = None
+        self.previous = []
+        self.rects = []
+        self.pulse_rects = []
+        self.signature = None
+        self.frames = 0
+        self.skipped = 0
+        self.pushed = 0
+
+    def invalidate(self):
+        self.background = None
+        self.signature = None
+
+    def begin(self, screen, bake, signature=None):
+        # Returns False when nothing needs to be drawn or presented
+        if signature is not None and signature == self.signature:
+            self.skipped += 1
+            return False
+
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.background = bake()
+            self.previous = [screen.get_rect()]
+            self.signature = None
+
+        if signature is not None:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                screen.blit(self.background, rect, rect)
+        self.rects = []
+        self.pulse_rects = []
+        return True
+
+    def present(self, screen, signature=None):
+        self.frames += 1
+        if signature is None:
+            rects = self.previous + self.rects
+            self.previous = self.rects
+        else:
+            # Static screens repaint everything, so the next dynamic frame restores it all
+            same_screen = self.signature is not None and self.signature[0] == signature[0]
+            rects = self.pulse_rects if same_screen else [screen.get_rect()]
+            self.previous = [screen.get_rect()]
+        self.signature = signature
+        self.pushed += len(rects)
+        return rects
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "rects_pushed": self.pushed,
+        }
+
+
+class Layer:
+    # A persistent transparent surface that remembers what was drawn on it, so
+    # clearing and compositing only touch those rects rather than the whole screen
+    def __init__(self, size, premultiplied=False):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.rects = []
+        # Premultiplied layers composite correctly when translucent content is
+        # stacked on the layer itself, but must be drawn with premultiplied sources
+        self.flags = pygame.BLEND_PREMULTIPLIED if premultiplied else 0
+
+    def begin(self):
+        for rect in self.rects:
+            self.surface.fill((0, 0, 0, 0), rect)
+        self.rects = []
+        return self.surface
+
+    def composite(self, screen, offset=(0, 0)):
+        # Overlapping rects are merged first so no pixel is blended twice
+        merged = []
+        for rect in self.rects:
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect = rect.union(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        self.rects = merged
+        ox, oy = offset
+        return [screen.blit(self.surface, (rect.x + ox, rect.y + oy), rect, self.flags) for rect in merged]
+
+
+class Compositor:
+    # Named screen-sized layers, allocated on first use and only reallocated
+    # when the screen size changes
+    def __init__(self):
+        self.layers = {}
+        self.size = None
+        self.allocations = 0
+
+    def layer(self, name, size, premultiplied=False):
+        if size != self.size:
+            self.layers.clear()
+            self.size = size
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = self.layers[name] = Layer(size, premultiplied)
+            self.allocations += 1
+        return layer
+
+    def stats(self):
+        return {
+            "layers": len(self.layers),
+            "allocations": self.allocations,
+        }
+
+
+class ProfilerSection:
+    # Reusable context manager that adds its elapsed time to the current frame
+    __slots__ = ("total", "start")
+
+    def __init__(self):
+        self.total = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self.start
+
+
+class FrameProfiler:
+    # Per-phase frame timings. Sections are timed with `with profiler.section(name):`
+    # and summed per frame; end_frame() stores the sums and the wall time since the
+    # previous frame in a ring of the last PROFILER_WINDOW frames, from which the
+    # percentiles, overlay and exports are computed on demand.
+    GRAPH_FRAMES = 240
+    GRAPH_HEIGHT = 80
+    GRAPH_MAX_MS = 50
+
+    def __init__(self, window=None):
+        self.window = window or Config.PROFILER_WINDOW
+        self.sections = {}
+        self.samples = {}
+        self.frame_times = np.zeros(self.window)
+        self.frames = 0
+        self.frame_start = time.perf_counter()
+        self.overlay_visible = False
+        self.overlay = None
+        self.extra_stats = {}
+
+    def add_stats(self, name, source):
+        # source() is called for a stats dict whenever a summary is taken
+        self.extra_stats[name] = source
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = ProfilerSection()
+            self.samples[name] = np.zeros(self.window)
+        return section
+
+    def end_frame(self):
+        now = time.perf_counter()
+        slot = self.frames % self.window
+        self.frame_times[slot] = now - self.frame_start
+        self.frame_start = now
+        for name, section in self.sections.items():
+            self.samples[name][slot] = section.total
+            section.total = 0.0
+        self.frames += 1
+
+    def _ordered(self, samples):
+        # Oldest to newest
+        if self.frames <= self.window:
+            return samples[:self.frames]
+        return np.roll(samples, -(self.frames % self.window))
+
+    def summary(self):
+        n = min(self.frames, self.window)
+
+        def describe(samples):
+            if n == 0:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+            ms = samples[:n] * 1000
+            p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+            return {"mean": float(ms.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+        return {
+            "frames": n,
+            "frame": describe(self.frame_times),
+            "sections": {name: describe(samples) for name, samples in self.samples.items()},
+            **{name: source() for name, source in self.extra_stats.items()},
+        }
+
+    def export_csv(self, path):
+        names = list(self.samples)
+        columns = [self._ordered(self.frame_times)] + [self._ordered(self.samples[name]) for name in names]
+        with open(path, "w") as file:
+            file.write(",".join(["frame_ms"] + [f"{name}_ms" for name in names]) + "\n")
+            for row in zip(*columns):
+                file.write(",".join(f"{value * 1000:.4f}" for value in row) + "\n")
+
+    def export_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.overlay = None
+
+    def draw_overlay(self, screen):
+        if not self.overlay_visible:
+            return None
+        if self.overlay is None or self.frames % Config.PROFILER_OVERLAY_REFRESH == 0:
+            self.overlay = self.render_overlay()
+        return screen.blit(self.overlay, (10, screen.get_height() - self.overlay.get_height() - 10))
+
+    def render_overlay(self):
+        font = Fonts.system("monospace", 16)
+        summary = self.summary()
+        frame = summary["frame"]
+        lines = [f"frame  p50 {frame['p50']:5.2f}  p95 {frame['p95']:5.2f}  p99 {frame['p99']:5.2f} ms"]
+        by_cost = sorted(summary["sections"].items(), key=lambda item: -item[1]["p95"])
+        for name, stats in by_cost:
+            lines.append(f"{name:<16} p50 {stats['p50']:5.2f}  p95 {stats['p95']:5.2f}  p99 {stats['p99']:5.2f}")
+
+        line_height = font.get_linesize()
+        width = self.GRAPH_FRAMES * 2 + 20
+        height = self.GRAPH_HEIGHT + 20 + line_height * len(lines)
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+
+        # Frame-time graph, newest on the right, with a line at the 60 FPS budget
+        times = self._ordered(self.frame_times)[-self.GRAPH_FRAMES:] * 1000
+        bottom = 10 + self.GRAPH_HEIGHT
+        for i, ms in enumerate(times.tolist()):
+            bar = min(ms / self.GRAPH_MAX_MS, 1.0) * self.GRAPH_HEIGHT
+            color = Colors.GREEN if ms <= 1000 / 60 else Colors.MUSTARD if ms <= 1000 / 30 else Colors.RED
+            pygame.draw.line(overlay, color, (10 + i * 2, bottom), (10 + i * 2, bottom - bar))
+        budget = bottom - (1000 / 60) / self.GRAPH_MAX_MS * self.GRAPH_HEIGHT
+        pygame.draw.line(overlay, Colors.OFF_WHITE, (10, budget), (width - 10, budget))
+
+        for i, line in enumerate(lines):
+            overlay.blit(font.render(line, True, Colors.OFF_WHITE), (10, bottom + 10 + i * line_height))
+        return prepare_surface(overlay)
+
+
+class DummyProfiler:
+    # Stand-in when Config.PROFILER is off
+    class Section:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    SECTION = Section()
+    overlay_visible = False
+
+    def section(self, name):
+        return self.SECTION
+
+    def end_frame(self):
+        pass
+
+    def add_stats(self, name, source):
+        pass
+
+    def toggle_overlay(self):
+        pass
+
+    def draw_overlay(self, screen):
+        return None
+
+    def summary(self):
+        return {}
+
+    def export_csv(self, path):
+        pass
+
+    def export_json(self, path):
+        pass
+
+
+class QualityLevel:
+    # One step of the effects ladder. particles scales every particle burst and
+    # emission rate, trail is the per-tick chance of a player trail particle;
+    # star_layers (farthest first) and angle_step of None keep the Config values.
+    def __init__(self, name, particles, trail, glow_rings, star_layers, angle_step):
+        self.name = name
+        self.particles = particles
+        self.trail = trail
+        self.glow_rings = glow_rings
+        self.star_layers = star_layers
+        self.angle_step = angle_step
+
+
+# Worst to best. Angle steps divide the 72 and 90 degree sprite symmetries.
+QUALITY_LEVELS = (
+    QualityLevel("low", particles=0.3, trail=0.1, glow_rings=0, star_layers=1, angle_step=18),
+    QualityLevel("medium", particles=0.6, trail=0.2, glow_rings=1, star_layers=2, angle_step=9),
+    QualityLevel("high", particles=1.0, trail=0.3, glow_rings=3, star_layers=None, angle_step=None),
+)
+
+
+class QualityGovernor:
+    # Picks the effects quality from recent frame work times: events, updates and
+    # drawing, not the wait for the frame cap. Every window frames it takes the
+    # 90th percentile; over budget steps one level down, under half the budget
+    # for upgrade_windows windows in a row steps one level up. Each decision only
+    # sees frames drawn at the current level, and the gap between the thresholds
+    # keeps it from flapping. A step up that is undone by the very next window
+    # doubles the number of good windows the next step up needs. A manual level
+    # (set_override) holds until it is set back to "auto".
+    MAX_UPGRADE_HOLD = 64
+    RECENT_CHANGES = 20
+
+    def __init__(self, target_ms=None, window=None, upgrade_windows=None, override=None):
+        self.target = (target_ms or Config.QUALITY_TARGET_MS or 1000 / (Config.FPS or 60)) / 1000
+        self.window = window or Config.QUALITY_WINDOW
+        self.samples = np.zeros(self.window)
+        self.filled = 0
+        self.upgrade_hold = upgrade_windows or Config.QUALITY_UPGRADE_WINDOWS
+        self.good_windows = 0
+        self.upgraded_at = None
+        self.level = len(QUALITY_LEVELS) - 1
+        self.override = None
+        self.total_frames = 0
+        self.frames = [0] * len(QUALITY_LEVELS)
+        self.seconds = [0.0] * len(QUALITY_LEVELS)
+        self.changes = 0
+        self.recent = deque(maxlen=self.RECENT_CHANGES)
+        self.last_p90 = 0.0
+        self.set_override(override)
+
+    @property
+    def current(self):
+        return QUALITY_LEVELS[self.level]
+
+    @property
+    def mode(self):
+        return "auto" if self.override is None else self.current.name
+
+    def set_override(self, name):
+        # A level name, or None / "auto" to follow the frame rate again
+        if name in (None, "auto"):
+            self.override = None
+        else:
+            self.override = [level.name for level in QUALITY_LEVELS].index(name)
+            self.change(self.override, "manual")
+        self.filled = 0
+        self.good_windows = 0
+
+    def cycle_override(self):
+        # auto, low, medium, high, auto, ...
+        modes = ["auto"] + [level.name for level in QUALITY_LEVELS]
+        self.set_override(modes[(modes.index(self.mode) + 1) % len(modes)])
+
+    def change(self, level, reason):
+        if level != self.level:
+            self.recent.append({"frame": self.total_frames, "from": self.current.name,
+                                "to": QUALITY_LEVELS[level].name, "reason": reason,
+                                "p90_ms": self.last_p90 * 1000})
+            self.changes += 1
+            self.level = level
+
+    def frame(self, work_time, frame_time):
+        # Records one frame; returns True when the level changed
+        self.total_frames += 1
+        self.frames[self.level] += 1
+        self.seconds[self.level] += frame_time
+        if self.override is not None:
+            return False
+        self.samples[self.filled] = work_time
+        self.filled += 1
+        if self.filled < self.window:
+            return False
+        self.filled = 0
+        self.last_p90 = float(np.percentile(self.samples, 90))
+
+        if self.last_p90 > self.target and self.level > 0:
+            if self.upgraded_at == self.total_frames - self.window:
+                self.upgrade_hold = min(self.upgrade_hold * 2, self.MAX_UPGRADE_HOLD)
+            self.good_windows = 0
+            self.change(self.level - 1, "over budget")
+            return True
+        if self.last_p90 < self.target * 0.5 and self.level < len(QUALITY_LEVELS) - 1:
+            self.good_windows += 1
+            if self.good_windows >= self.upgrade_hold:
+                self.good_windows = 0
+                self.upgraded_at = self.total_frames
+                self.change(self.level + 1, "headroom")
+                return True
+        else:
+            self.good_windows = 0
+        return False
+
+    def stats(self):
+        total = sum(self.seconds) or 1.0
+        return {
+            "level": self.current.name,
+            "mode": self.mode,
+            "target_ms": self.target * 1000,
+            "p90_ms": self.last_p90 * 1000,
+            "changes": self.changes,
+            "upgrade_windows": self.upgrade_hold,
+            "frames": {level.name: n for level, n in zip(QUALITY_LEVELS, self.frames)},
+            "time_share": {level.name: s / total for level, s in zip(QUALITY_LEVELS, self.seconds)},
+            "recent_changes": list(self.recent),
+        }
+
+
+class PersistenceWorker:
+    # Runs file writes off the frame loop. Jobs are queued under a key, and a job
+    # still waiting when another arrives under the same key is replaced, so a
+    # burst of saves becomes one write. On the desktop a daemon thread does the
+    # writing; in the browser, which has no threads, an asyncio task runs one job
+    # per event loop turn, between frames instead of in the middle of one.
+    def __init__(self, threaded=None):
+        self.threaded = not hasattr(sys, "__EMSCRIPTEN__") if threaded is None else threaded
+        self.pending = OrderedDict()  # key -> (job, time first queued)
+        self.condition = threading.Condition()
+        self.runner = None
+        self.busy = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_error = None  # "key: error" of the most recent failed job
+        self.last_flush = 0.0
+        self.latencies = deque(maxlen=Config.PERSISTENCE_WINDOW)  # Queued to written, seconds
+        self.write_times = deque(maxlen=Config.PERSISTENCE_WINDOW)
+
+    def submit(self, key, job):
+        with self.condition:
+            self.submitted += 1
+            if key in self.pending:
+                self.coalesced += 1
+                self.pending[key] = (job, self.pending[key][1])
+            else:
+                self.pending[key] = (job, time.perf_counter())
+            self.condition.notify()
+            # Under the lock, so two threads submitting at once start one runner
+            if self.runner is None:
+                self.start()
+
+    def start(self):
+        if self.threaded:
+            self.runner = threading.Thread(target=self.work, name="persistence", daemon=True)
+            self.runner.start()
+            return
+        try:
+            self.runner = asyncio.get_running_loop().create_task(self.work_async())
+        except RuntimeError:
+            # No event loop to defer to, so write now
+            self.drain()
+
+    def next_job(self):
+        with self.condition:
+            key, (job, queued) = self.pending.popitem(last=False)
+            self.busy = True
+        return key, job, queued
+
+    def run(self, key, job, queued):
+        start = time.perf_counter()
+        error = None
+        try:
+            job()
+        except Exception as e:
+            # A failed write must not stop the ones queued behind it; stats() reports it
+            error = f"{key}: {e}"
+        end = time.perf_counter()
+        with self.condition:
+            self.completed += 1
+            if error is not None:
+                self.failed += 1
+                self.last_error = error
+            self.latencies.append(end - queued)
+            self.write_times.append(end - start)
+            self.busy = False
+            self.condition.notify_all()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            self.run(*self.next_job())
+
+    async def work_async(self):
+        while self.pending:
+            self.run(*self.next_job())
+            await asyncio.sleep(0)
+        self.runner = None
+
+    def drain(self):
+        while self.pending:
+            self.run(*self.next_job())
+
+    def flush(self):
+        # Blocks until everything queued so far is written; called on quit
+        start = time.perf_counter()
+        if self.threaded:
+            with self.condition:
+                while self.pending or self.busy:
+                    self.condition.wait()
+        else:
+            self.drain()
+        self.last_flush = time.perf_counter() - start
+
+    def stats(self):
+        with self.condition:
+            latencies = np.array(self.latencies) * 1000
+            write_times = np.array(self.write_times) * 1000
+            counts = {
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "failed": self.failed,
+                "last_error": self.last_error,
+                "pending": len(self.pending),
+            }
+
+        def describe(ms):
+            if len(ms) == 0:
+                return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+            return {"mean": float(ms.mean()), "p95": float(np.percentile(ms, 95)), "max": float(ms.max())}
+
+        counts["latency_ms"] = describe(latencies)
+        counts["write_ms"] = describe(write_times)
+        counts["last_flush_ms"] = self.last_flush * 1000
+        return counts
 
 
 class SoundEffects:
@@ -429,86 +2193,260 @@ class DummySound:
 
 
 class Game:
+    # Exhaust colors indexed by BlockType value
+    BLOCK_PARTICLE_COLORS = np.array([Block.PARTICLE_COLORS[block_type] for block_type in BlockType], dtype=np.uint8)
+    # Snapshot header: held action, shake amount, simulation bytes, particle count (-1 if left out)
+    SNAPSHOT_HEADER = struct.Struct("<idIi")
+
     def __init__(self):
         pygame.init()
         
-        # For web compatibility, use resizable mode
-        self.screen = pygame.display.set_mode((Config.WIDTH, Config.HEIGHT), pygame.RESIZABLE)
+        # For web compatibility, use resizable mode. Everything is drawn to
+        # self.screen: the window itself, or with Config.CANVAS_SIZE a canvas of
+        # that fixed size which is scaled to fit the window in one pass
+        self.scaled = Config.CANVAS_SIZE is not None
+        self.viewport_surface = None  # Set while the canvas is scaled in software
+        if self.scaled:
+            Config.WIDTH, Config.HEIGHT = Config.CANVAS_SIZE
+        self.open_display(Config.WIDTH, Config.HEIGHT)
         pygame.display.set_caption("Falling Blocks - Enhanced")
         self.clock = pygame.time.Clock()
         
         # Better fonts
-        pygame.font.init()
-        default_font = pygame.font.get_default_font()
-        self.font = pygame.font.Font(default_font, 35)
-        self.big_font = pygame.font.Font(default_font, 70)
-        self.small_font = pygame.font.Font(default_font, 20)
+        self.font = Fonts.get(35)
+        self.big_font = Fonts.get(70)
+        self.small_font = Fonts.get(20)
+        self.text_cache = TextCache()
+
+        # Persistent render layers
+        self.compositor = Compositor()
+
+        # Frame timings (F3 overlay, F4 export)
+        self.profiler = FrameProfiler() if Config.PROFILER else DummyProfiler()
+        self.profiler.add_stats("text_cache", self.text_cache.stats)
+        self.profiler.add_stats("compositor", self.compositor.stats)
+        self.hud_key = None
+
+        # High score and replay writes happen in the background
+        self.persistence = PersistenceWorker()
+        self.profiler.add_stats("persistence", self.persistence.stats)
+
+        # Shared leaderboard, off unless a server is configured (browsers have no sockets)
+        self.leaderboard = None
+        if Config.LEADERBOARD_HOST and not hasattr(sys, "__EMSCRIPTEN__"):
+            self.leaderboard = LeaderboardClient(Config.LEADERBOARD_HOST, Config.LEADERBOARD_PORT,
+                                                 self.persistence, Config.LEADERBOARD_TTL)
+            self.profiler.add_stats("leaderboard", self.leaderboard.stats)
+        self.heart_frames = {}
+
+        # Dirty-rect presentation (opt-in)
+        self.dirty = DirtyRectRenderer() if Config.DIRTY_RECTS else None
+        if self.dirty is not None:
+            self.profiler.add_stats("dirty_rects", self.dirty.stats)
+        self.frame_rects = None
+
+        # Pre-rendered block and player frames, from the build-time atlas where there is one;
+        # its pages are only read once a frame of their kind is drawn
+        self.sprites = SpriteCache()
+        self.atlas = SpriteAtlas.load(Config.SPRITE_ATLAS) if Config.SPRITE_ATLAS else None
+        if self.atlas is not None:
+            self.sprites.load_atlas(self.atlas)
+        if Config.SPRITE_PREWARM:
+            self.sprites.prewarm()
+        self.profiler.add_stats("sprites", self.sprites.stats)
+
+        # Effects quality, lowered while frames run over budget (F5 cycles a fixed level)
+        self.quality = QualityGovernor(override=Config.QUALITY)
+        self.profiler.add_stats("quality", self.quality.stats)
         
         # Initialize game components
         self.init_game()
+        self.apply_quality()
     
     def init_game(self):
-        self.player = Player()
-        self.blocks = []
-        self.particles = []
+        self.sim = Simulation(self.profiler)
+        self.action = Action.STOP
+        self.menu_blocks = []
+        self.block_pool = BlockPool()
+        # Pool and column store sizes
+        self.profiler.add_stats("blocks", self.sim.blocks.stats)
+        self.profiler.add_stats("block_pool", self.block_pool.stats)
+        self.menu_panel = None
+        self.pause_overlay = None
+        self.particles = ParticleSystem()
+        if self.atlas is not None:
+            self.particles.sprites.load_atlas(self.atlas)
+        self.profiler.add_stats("particles", self.particles.stats)
+        self.profiler.add_stats("particle_sprites", self.particles.sprites.stats)
         self.sounds = SoundEffects.generate_sounds()
-        self.high_scores = [0] * Config.HIGH_SCORES_COUNT
         self.load_high_scores()
         self.menu_offset = 0
         self.shake_amount = 0
-        self.slow_mo_factor = 1.0
-        self.magnet_enabled = False
         
         # Background stars
-        self.stars = []
-        for _ in range(100):
-            self.stars.append([
-                random.randint(0, Config.WIDTH),
-                random.randint(0, Config.HEIGHT),
-                random.uniform(0.2, 1.0),
-                random.choice([Colors.OFF_WHITE, Colors.LIGHT_BLUE, Colors.MINT])
-            ])
+        self.starfield = Starfield(Config.WIDTH, Config.HEIGHT)
+        
+        # Replay being recorded, and the inputs of one being played back
+        self.recorder = None
+        self.playback = None
         
         self.reset_game()
         self.state = GameState.MENU
 
-    def load_high_scores(self):
-        try:
-            with open("high_scores.txt", "r") as f:
-                self.high_scores = [int(score) for score in f.read().split(",")]
-                # Ensure we have the right number of high scores
-                while len(self.high_scores) < Config.HIGH_SCORES_COUNT:
-                    self.high_scores.append(0)
-        except:
-            self.high_scores = [0] * Config.HIGH_SCORES_COUNT
-
-    def save_high_scores(self):
-        try:
-            with open("high_scores.txt", "w") as f:
-                f.write(",".join(map(str, self.high_scores)))
-        except:
-            pass  # Silently fail if we can't save
+    # The rules live in self.sim; these keep the renderer's view of them short
+    @property
+    def player(self):
+        return self.sim.player
 
-    def reset_game(self):
-        self.player.reset_position()
-        self.blocks.clear()
+    @property
+    def score(self):
+        return self.sim.score
+
+    @property
+    def lives(self):
+        return self.sim.lives
+
+    @property
+    def speed(self):
+        return self.sim.speed
+
+    def load_high_scores(self):
+        self.score_store = HighScoreStore(Config.HIGH_SCORE_STORE, Config.HIGH_SCORES_FILE)
+        self.refresh_high_scores()
+
+    def refresh_high_scores(self):
+        # The top of the table, padded with zeros for the high score screen. The
+        # shared leaderboard wins when it is reachable, otherwise the local store.
+        shared = self.leaderboard.top(Config.HIGH_SCORES_COUNT) if self.leaderboard is not None else None
+        self.high_scores = shared if shared is not None else self.score_store.top_scores(Config.HIGH_SCORES_COUNT)
+        self.high_scores += [0] * (Config.HIGH_SCORES_COUNT - len(self.high_scores))
+
+    def reset_game(self, seed=None):
+        self.sim.reset(seed)
+        self.action = Action.STOP
         self.particles.clear()
-        self.score = 0
-        self.speed = Config.INITIAL_SPEED
-        self.lives = Config.LIVES
-        self.magnet_enabled = False
-        self.slow_mo_factor = 1.0
         self.shake_amount = 0
 
+        # Record the new game unless it is itself a replay
+        self.recorder = None
+        if Config.RECORD_REPLAYS and self.playback is None:
+            self.recorder = Replay(self.sim.seed, Config.WIDTH, Config.HEIGHT)
+
+    def open_display(self, width, height):
+        # Sets up self.window and self.screen for a playfield of this size
+        if not self.scaled:
+            self.window = self.screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+            return
+        if self.viewport_surface is None:
+            # SDL scales the canvas to the window itself, on the GPU where there is one
+            os.environ["SDL_RENDER_SCALE_QUALITY"] = "nearest" if Config.CANVAS_FILTER == "nearest" else "linear"
+            try:
+                self.window = self.screen = pygame.display.set_mode((width, height), pygame.SCALED | pygame.RESIZABLE)
+                return
+            except pygame.error:
+                # No renderer, or SCALED cannot change size once created
+                self.window = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+        self.screen = pygame.Surface((width, height)).convert()
+        self.fit_viewport()
+
+    def resize_window(self, width, height):
+        # The window changed size; the playfield only follows it without a canvas
+        if not self.scaled:
+            self.resize(max(width, Config.MIN_WIDTH), max(height, Config.MIN_HEIGHT))
+            return
+        if self.viewport_surface is not None:
+            self.window = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+            self.fit_viewport()
+        if self.dirty is not None:
+            # Static screens would otherwise skip presenting into the new window
+            self.dirty.invalidate()
+
+    def fit_viewport(self):
+        # Largest rect of the canvas's aspect ratio centred in the window, with black bars around it
+        window_width, window_height = self.window.get_size()
+        width, height = self.screen.get_size()
+        scale = min(window_width / width, window_height / height)
+        self.viewport = pygame.Rect(0, 0, max(1, round(width * scale)), max(1, round(height * scale)))
+        self.viewport.center = (window_width // 2, window_height // 2)
+        self.window.fill((0, 0, 0))
+        self.viewport_surface = self.window.subsurface(self.viewport)
+
+    def resize(self, width, height):
+        # Resizes the playfield: the window, or the canvas when there is one
+        self.open_display(width, height)
+        if self.dirty is not None:
+            self.dirty.invalidate()
+        if self.recorder is not None:
+            self.recorder.record_resize(width, height)
+        # Update game dimensions and player position
+        self.sim.resize(width, height)
+        self.starfield.resize(width, height)
+        self.menu_panel = None
+        self.pause_overlay = None
+
+    def start_replay(self, replay):
+        # Play a recorded session back through the normal update/draw path
+        self.playback = replay.inputs()
+        if (Config.WIDTH, Config.HEIGHT) != (replay.width, replay.height):
+            self.resize(replay.width, replay.height)
+        self.reset_game(replay.seed)
+        self.state = GameState.PLAYING
+
+    def snapshot(self, particles=False):
+        # Gameplay state plus the held input; particles are cosmetic and only
+        # included when asked for, since they can outweigh everything else
+        sim = self.sim.snapshot()
+        count = self.particles.count if particles else -1
+        header = self.SNAPSHOT_HEADER.pack(self.action.value, self.shake_amount, len(sim), count)
+        return header + sim + (self.particles.pack() if particles else b"")
+
+    def restore(self, data):
+        # Leaves self.state alone, so the caller decides what screen to show
+        action, shake, sim_size, count = self.SNAPSHOT_HEADER.unpack_from(data)
+        data = memoryview(data)[self.SNAPSHOT_HEADER.size:]
+        width, height = Simulation.STATE.unpack_from(data)[:2]
+        if self.screen.get_size() != (width, height):
+            self.resize(width, height)
+        self.sim.restore(data[:sim_size])
+        self.action = Action(action)
+        self.shake_amount = shake
+        if count >= 0:
+            self.particles.unpack(data, count, sim_size)
+        else:
+            self.particles.clear()
+        # A recording made before the jump no longer matches what is played
+        self.recorder = None
+
+    def save_replay(self):
+        replay, self.recorder = self.recorder, None
+        replay.finish(self.score, self.lives)
+        path = os.path.join(Config.REPLAY_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{replay.seed}.fbr")
+        self.persistence.submit(path, lambda: self.write_replay(replay, path))
+
+    @staticmethod
+    def write_replay(replay, path):
+        try:
+            os.makedirs(Config.REPLAY_DIR, exist_ok=True)
+            replay.save(path)
+        except OSError:
+            pass  # Silently fail if we can't save
+
     def check_high_score(self):
-        for i, score in enumerate(self.high_scores):
-            if self.score > score:
-                # Insert new high score
-                self.high_scores.insert(i, self.score)
-                self.high_scores.pop()  # Remove lowest score
-                self.save_high_scores()
-                return True
-        return False
+        # Every finished run is kept; it is a high score if it makes the table
+        rank = self.score_store.add(self.score, seed=self.sim.seed)
+        self.persistence.submit("high_scores", self.score_store.flush)
+        if self.leaderboard is not None:
+            shared = self.leaderboard.submit(self.score, seed=self.sim.seed)
+            if shared is not None:
+                rank = shared
+        self.refresh_high_scores()
+        return self.score > 0 and rank <= Config.HIGH_SCORES_COUNT
+
+    def close(self):
+        # Queued saves must reach the disk (and the leaderboard) before the process exits
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+        self.persistence.flush()
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -517,24 +2455,24 @@ class Game:
                 
             # Handle window resize
             if event.type == pygame.VIDEORESIZE:
-                width = max(event.w, Config.MIN_WIDTH)  # Minimum width
-                height = max(event.h, Config.MIN_HEIGHT)  # Minimum height
-                self.screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
-                # Update game dimensions
-                scale_x = width / Config.WIDTH
-                scale_y = height / Config.HEIGHT
-                Config.WIDTH = width
-                Config.HEIGHT = height
-                # Update player position
-                self.player.pos[0] *= scale_x
-                self.player.pos[1] = Config.HEIGHT - 2 * self.player.size
+                self.resize_window(event.w, event.h)
 
             if event.type == pygame.KEYDOWN:
+                # Profiler overlay and export work in every state
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
+                elif event.key == pygame.K_F4:
+                    self.profiler.export_csv("profile.csv")
+                    self.profiler.export_json("profile.json")
+                elif event.key == pygame.K_F5:
+                    self.quality.cycle_override()
+                    self.apply_quality()
+
                 if self.state == GameState.PLAYING:
                     if event.key == pygame.K_LEFT:
-                        self.player.move(-1)
+                        self.action = Action.LEFT
                     elif event.key == pygame.K_RIGHT:
-                        self.player.move(1)
+                        self.action = Action.RIGHT
                     elif event.key == pygame.K_p:
                         self.state = GameState.PAUSED
                     elif event.key == pygame.K_ESCAPE:
@@ -562,28 +2500,40 @@ class Game:
             if event.type == pygame.KEYUP:
                 if self.state == GameState.PLAYING:
                     if event.key == pygame.K_LEFT or event.key == pygame.K_RIGHT:
-                        self.player.stop()
+                        self.action = Action.STOP
 
             # Add touch controls for mobile web
             if event.type == pygame.FINGERDOWN:
                 if self.state == GameState.PLAYING:
                     if event.x < 0.5:
-                        self.player.move(-1)
+                        self.action = Action.LEFT
                     else:
-                        self.player.move(1)
+                        self.action = Action.RIGHT
                 elif self.state in [GameState.MENU, GameState.GAME_OVER, GameState.PAUSED]:
-                    self.state = GameState.PLAYING
                     if self.state == GameState.GAME_OVER:
                         self.reset_game()
+                    self.state = GameState.PLAYING
                 elif self.state == GameState.HIGH_SCORES:
                     self.state = GameState.MENU
 
             if event.type == pygame.FINGERUP:
                 if self.state == GameState.PLAYING:
-                    self.player.stop()
+                    self.action = Action.STOP
 
         return True
 
+    def apply_quality(self):
+        # Hand the governor's current level to the effects that scale with it
+        level = self.quality.current
+        self.effects_scale = level.particles
+        self.trail_chance = level.trail
+        self.sprites.glow_rings = level.glow_rings
+        self.sprites.angle_step = level.angle_step or Config.SPRITE_ANGLE_STEP
+        self.starfield.visible_layers = level.star_layers
+        if self.dirty is not None:
+            # The baked background holds the old star layers
+            self.dirty.invalidate()
+
     def update(self):
         # Update menu animation
         self.menu_offset = (self.menu_offset + 1) % 360
@@ -594,128 +2544,168 @@ class Game:
             if self.shake_amount < 0.1:
                 self.shake_amount = 0
         
-        # Update stars
-        for star in self.stars:
-            star[1] += star[2] * 0.5  # Move stars based on size
-            if star[1] > Config.HEIGHT:
-                star[1] = 0
-                star[0] = random.randint(0, Config.WIDTH)
-        
-        if self.state != GameState.PLAYING:
-            return
+        profiler = self.profiler
 
-        # Check player power-ups
-        self.slow_mo_factor = 0.5 if self.player.has_power(PowerUpType.SLOW_TIME) else 1.0
-        self.magnet_enabled = self.player.has_power(PowerUpType.MAGNET)
-        
-        self.player.update()
+        if self.leaderboard is not None:
+            # Retry queued submissions and keep the shared table fresh while it is shown
+            self.leaderboard.poll()
+            if self.state == GameState.HIGH_SCORES:
+                self.refresh_high_scores()
+
+        # Update stars
+        with profiler.section("update.stars"):
+            self.starfield.update()
         
-        # Update global particles
-        self.particles = [p for p in self.particles if p.update()]
+        if self.state == GameState.MENU:
+            with profiler.section("update.particles"):
+                self.particles.update()
+
+            # Animated blocks falling in the menu background
+            with profiler.section("update.menu"):
+                if random.random() < 0.02:
+                    self.menu_blocks.append(self.block_pool.acquire())
+                for block in self.menu_blocks:
+                    block.prev_pos[:] = block.pos
+                    block.update(2)
+                    block.emit_exhaust(self.particles, 0.1 * self.effects_scale)
+                if any(block.pos[1] > Config.HEIGHT for block in self.menu_blocks):
+                    for block in self.menu_blocks:
+                        if block.pos[1] > Config.HEIGHT:
+                            self.block_pool.release(block)
+                    self.menu_blocks = [block for block in self.menu_blocks if block.pos[1] <= Config.HEIGHT]
 
-        # Spawn new blocks
-        if len(self.blocks) < Config.MAX_BLOCKS and random.random() < Config.BLOCK_SPAWN_RATE * self.slow_mo_factor:
-            self.blocks.append(Block())
+        if self.state in (GameState.PLAYING, GameState.PAUSED):
+            if self.playback is not None:
+                # The replay decides this tick's input
+                step = next(self.playback, None)
+                if step is None:
+                    self.playback = None
+                    self.state = GameState.GAME_OVER
+                    return
+                action, paused, size = step
+                if size is not None:
+                    self.resize(*size)
+                self.action = action
+                self.state = GameState.PAUSED if paused else GameState.PLAYING
+            if self.recorder is not None:
+                self.recorder.record(self.action, self.state == GameState.PAUSED)
 
-        # Update blocks and check for scoring
-        for block in self.blocks[:]:
-            current_speed = self.speed * self.slow_mo_factor
-            
-            # Apply magnet effect if active
-            if self.magnet_enabled and block.block_type in [BlockType.BONUS, BlockType.POWER_UP]:
-                # Calculate vector from block to player
-                dx = (self.player.pos[0] + self.player.size // 2) - (block.pos[0] + block.size // 2)
-                dy = (self.player.pos[1] + self.player.size // 2) - (block.pos[1] + block.size // 2)
-                distance = math.sqrt(dx * dx + dy * dy)
-                
-                if distance < Config.MAGNET_RADIUS:
-                    # Normalize and apply attraction
-                    attraction = 5 * (1 - distance / Config.MAGNET_RADIUS)
-                    if distance > 0:
-                        block.pos[0] += dx / distance * attraction
-                        block.pos[1] += dy / distance * attraction
-            
-            block.update(current_speed)
-            
-            # Check if block is off screen
-            if block.is_off_screen():
-                # Score points for letting harmful blocks pass
-                if block.block_type == BlockType.HARMFUL and block.active:
-                    self.score += 2
-                    
-                    # Add score particles
-                    for _ in range(5):
-                        self.particles.append(
-                            Particle(
-                                block.pos[0] + block.size // 2,
-                                Config.HEIGHT,
-                                Colors.GOLD,
-                                random.uniform(-2, 2),
-                                random.uniform(-5, -2),
-                                random.randint(3, 6)
-                            )
-                        )
-                
-                # Only remove blocks that aren't showing destruction animation
-                if not block.particles:
-                    self.blocks.remove(block)
+        if self.state != GameState.PLAYING:
+            return
 
-        # Check for collisions with player
-        player_rect = pygame.Rect(self.player.pos[0], self.player.pos[1], self.player.size, self.player.size)
-        for block in self.blocks[:]:
-            if not block.active or block.scale <= 0:
-                continue
-                
-            block_rect = pygame.Rect(block.pos[0], block.pos[1], block.size, block.size)
-            if player_rect.colliderect(block_rect):
-                block.deactivate()
-                
-                if block.block_type == BlockType.HARMFUL:
-                    if not self.player.has_power(PowerUpType.SHIELD):
-                        self.lives -= 1
-                        self.shake_amount = 10
-                        
-                        if self.lives == 0:
-                            if self.check_high_score():
-                                self.state = GameState.HIGH_SCORES
-                            else:
-                                self.state = GameState.GAME_OVER
-                    else:
-                        # Shield absorbed the hit
-                        pass
-                        
-                elif block.block_type == BlockType.NORMAL:
-                    self.score += 1
-                
-                elif block.block_type == BlockType.BONUS:
-                    self.score += 5
-                    
-                elif block.block_type == BlockType.POWER_UP:
-                    if block.power_up_type == PowerUpType.SHIELD:
-                        self.player.activate_power(PowerUpType.SHIELD, Config.SHIELD_DURATION)
-                    elif block.power_up_type == PowerUpType.SLOW_TIME:
-                        self.player.activate_power(PowerUpType.SLOW_TIME, Config.SLOW_TIME_DURATION)
-                    elif block.power_up_type == PowerUpType.MAGNET:
-                        self.player.activate_power(PowerUpType.MAGNET, Config.MAGNET_DURATION)
-                    elif block.power_up_type == PowerUpType.EXTRA_LIFE:
-                        self.lives = min(self.lives + 1, 5)  # Cap at 5 lives
-                
-                # Only remove blocks that aren't showing destruction animation
-                if not block.particles:
-                    self.blocks.remove(block)
+        # Update particles
+        with profiler.section("update.particles"):
+            self.particles.update()
+
+        events = self.sim.step(self.action)
+
+        # Cosmetic effects for the new tick
+        with profiler.section("update.effects"):
+            for event in events:
+                self.handle_sim_event(event)
+            self.player.emit_trail(self.particles, self.trail_chance)
+            self.emit_block_exhaust()
+
+    def emit_block_exhaust(self):
+        # Vectorized counterpart of Block.emit_exhaust for the simulation's blocks
+        blocks = self.sim.blocks
+        n = blocks.count
+        rng = self.particles.rng
+        emitting = blocks.active[:n] & (rng.random(n) < 0.1 * self.effects_scale)
+        count = int(np.count_nonzero(emitting))
+        if count == 0:
+            return
+        self.particles.emit_many(
+            blocks.x[:n][emitting] + blocks.size // 2,
+            blocks.y[:n][emitting] + blocks.size,
+            self.BLOCK_PARTICLE_COLORS[blocks.block_type[:n][emitting]],
+            rng.uniform(-1, 1, count),
+            rng.uniform(1, 3, count),
+            rng.integers(2, 5, count, endpoint=True)
+        )
+
+    def handle_sim_event(self, event):
+        kind, x, y, block_type = event
+        if kind == SimEvent.COLLECT:
+            # Create explosion particles
+            count = 20 if block_type == BlockType.POWER_UP else 10
+            count = max(1, round(count * self.effects_scale))
+            self.particles.burst(x, y, Block.PARTICLE_COLORS[block_type], count)
+
+        elif kind == SimEvent.DODGE:
+            # Add score particles
+            rng = self.particles.rng
+            count = max(1, round(5 * self.effects_scale))
+            self.particles.emit_many(
+                x, y, Colors.GOLD,
+                rng.uniform(-2, 2, count),
+                rng.uniform(-5, -2, count),
+                rng.integers(3, 6, count, endpoint=True)
+            )
 
-        # Update speed based on score, but cap it
-        self.speed = min(Config.INITIAL_SPEED + (self.score // 15), 15)
+        elif kind == SimEvent.HIT:
+            self.shake_amount = 10
+
+        elif kind == SimEvent.GAME_OVER:
+            if self.recorder is not None:
+                self.save_replay()
+            if self.playback is not None:
+                # Replays do not count towards high scores
+                self.playback = None
+                self.state = GameState.GAME_OVER
+            elif self.check_high_score():
+                self.state = GameState.HIGH_SCORES
+            else:
+                self.state = GameState.GAME_OVER
 
-    def draw(self):
-        self.screen.fill(Colors.BACKGROUND)
+    def draw_background(self, surface):
+        surface.fill(Colors.BACKGROUND)
         
         # Draw stars in background
-        for star in self.stars:
-            # Make stars twinkle
-            brightness = 0.5 + 0.5 * math.sin(self.menu_offset * 0.01 + star[0] * 0.01)
-            color = tuple(int(c * brightness) for c in star[3][:3])
-            pygame.draw.circle(self.screen, color, (star[0], star[1]), star[2])
+        self.starfield.draw(surface)
+
+    def bake_background(self):
+        # Dirty-rect mode restores from this snapshot, so the starfield holds still
+        background = pygame.Surface(self.screen.get_size())
+        self.draw_background(background)
+        return prepare_surface(background).convert() if pygame.display.get_surface() else background
+
+    def option_alpha(self):
+        # Pulsing brightness of menu options
+        pulse = 0.7 + 0.3 * math.sin(self.menu_offset * 0.1)
+        if self.dirty is not None:
+            levels = Config.DIRTY_PULSE_LEVELS
+            pulse = round(pulse * levels) / levels
+        return int(255 * pulse)
+
+    def heart_level(self):
+        # Brightness step of the pulsing last heart
+        return round((0.8 + 0.2 * math.sin(self.menu_offset * 0.1)) * Config.HUD_PULSE_LEVELS)
+
+    def mark(self, rect):
+        # Record a drawn region for dirty-rect presentation
+        if self.frame_rects is not None and rect is not None:
+            self.frame_rects.append(rect)
+
+    def draw(self, alpha=1.0):
+        # alpha is how far the frame lies between the last two simulation ticks.
+        # Nothing moves outside play, so everything is drawn where it stopped.
+        if self.state != GameState.PLAYING:
+            alpha = 1.0
+        profiler = self.profiler
+        signature = None
+        if self.dirty is not None:
+            if self.state in (GameState.PAUSED, GameState.GAME_OVER, GameState.HIGH_SCORES):
+                static_key = (self.state, self.score, tuple(self.high_scores), self.screen.get_size())
+                # The paused HUD's heart keeps pulsing, like the option text
+                heart = self.heart_level() if self.state == GameState.PAUSED and self.lives > 0 else None
+                signature = (static_key, self.option_alpha(), heart)
+            if not self.dirty.begin(self.screen, self.bake_background, signature):
+                return
+            self.frame_rects = self.dirty.rects
+        else:
+            with profiler.section("draw.background"):
+                self.draw_background(self.screen)
         
         # Apply screen shake if active
         shake_offset = [0, 0]
@@ -725,241 +2715,336 @@ class Game:
                 random.randint(-int(self.shake_amount), int(self.shake_amount))
             ]
         
-        if self.state == GameState.MENU:
-            # Animated title
-            title_y = Config.HEIGHT // 6 + math.sin(self.menu_offset * 0.05) * 10
-            self.draw_text("FALLING BLOCKS", self.big_font, Colors.MUSTARD, Config.WIDTH // 2, title_y)
-            
-            # Menu options with pulsing effect
-            pulse = 0.7 + 0.3 * math.sin(self.menu_offset * 0.1)
-            option_color = tuple(int(c * pulse) for c in Colors.OFF_WHITE)
-            
-            self.draw_text("Press SPACE to start", self.font, option_color, Config.WIDTH // 2, Config.HEIGHT // 6 + 80)
-            self.draw_text("Press H for high scores", self.font, option_color, Config.WIDTH // 2, Config.HEIGHT // 6 + 130)
-            
-            # Game instructions
-            help_y = Config.HEIGHT // 2 + 50  # Moved down to avoid overlap
-            help_bg = pygame.Surface((Config.WIDTH - 200, 300), pygame.SRCALPHA)  # Made taller
-            help_bg.fill((0, 0, 0, 180))  # Made more opaque
-            self.screen.blit(help_bg, (100, help_y - 20))
-            
-            self.draw_text("HOW TO PLAY", self.font, Colors.MINT, Config.WIDTH // 2, help_y)
-            
-            # Draw block examples and their explanations
-            block_x = Config.WIDTH // 4
-            text_x = block_x + 180
-            spacing = 50  # Increased spacing
-            
-            # Normal block
-            block = Block(BlockType.NORMAL)
-            block.pos = [block_x - block.size // 2, help_y + spacing]
-            block.draw(self.screen)
-            self.draw_text("Normal Block (+1 point)", self.small_font, Colors.TEAL, text_x, help_y + spacing + 10)
-            
-            # Harmful block
-            block = Block(BlockType.HARMFUL)
-            block.pos = [block_x - block.size // 2, help_y + spacing * 2]
-            block.draw(self.screen)
-            self.draw_text("Harmful Block (avoid or +2 points if dodged)", self.small_font, Colors.RED, text_x, help_y + spacing * 2 + 10)
-            
-            # Bonus block
-            block = Block(BlockType.BONUS)
-            block.pos = [block_x - block.size // 2, help_y + spacing * 3]
-            block.draw(self.screen)
-            self.draw_text("Bonus Block (+5 points)", self.small_font, Colors.GREEN, text_x, help_y + spacing * 3 + 10)
-            
-            # Power-up blocks
-            power_up_x = Config.WIDTH * 3 // 4 - 50
-            power_text_x = power_up_x + 180
-            
-            # Shield power-up
-            block = Block(BlockType.POWER_UP)
-            block.power_up_type = PowerUpType.SHIELD
-            block.pos = [power_up_x - block.size // 2, help_y + spacing]
-            block.draw(self.screen)
-            self.draw_text("Shield (blocks damage)", self.small_font, Colors.LIGHT_BLUE, power_text_x, help_y + spacing + 10)
-            
-            # Slow time power-up
-            block = Block(BlockType.POWER_UP)
-            block.power_up_type = PowerUpType.SLOW_TIME
-            block.pos = [power_up_x - block.size // 2, help_y + spacing * 2]
-            block.draw(self.screen)
-            self.draw_text("Slow Time (reduces block speed)", self.small_font, Colors.PURPLE, power_text_x, help_y + spacing * 2 + 10)
+        # Menu and overlay screens
+        with profiler.section("draw.screen"):
+            if self.state == GameState.MENU:
+                # Animated title
+                title_y = Config.HEIGHT // 6 + math.sin(self.menu_offset * 0.05) * 10
+                self.draw_text("FALLING BLOCKS", self.big_font, Colors.MUSTARD, Config.WIDTH // 2, title_y)
             
-            # Magnet power-up
-            block = Block(BlockType.POWER_UP)
-            block.power_up_type = PowerUpType.MAGNET
-            block.pos = [power_up_x - block.size // 2, help_y + spacing * 3]
-            block.draw(self.screen)
-            self.draw_text("Magnet (attracts bonus items)", self.small_font, Colors.MINT, power_text_x, help_y + spacing * 3 + 10)
+                # Menu options with pulsing effect
+                option_alpha = self.option_alpha()
             
-            # Controls
-            controls_y = help_y + spacing * 4 + 30  # Increased spacing
-            controls_bg = pygame.Surface((Config.WIDTH - 200, 50), pygame.SRCALPHA)
-            controls_bg.fill((0, 0, 0, 180))  # Made more opaque
-            self.screen.blit(controls_bg, (100, controls_y - 10))
+                self.draw_text("Press SPACE to start", self.font, Colors.OFF_WHITE, Config.WIDTH // 2, Config.HEIGHT // 6 + 80,
+                               option_alpha)
+                self.draw_text("Press H for high scores", self.font, Colors.OFF_WHITE, Config.WIDTH // 2, Config.HEIGHT // 6 + 130,
+                               option_alpha)
             
-            self.draw_text("Controls: ← → arrows to move   |   P to pause   |   ESC for menu", 
-                         self.small_font, Colors.OFF_WHITE, Config.WIDTH // 2, controls_y)
+                # Game instructions: the static panel is composited once and reused
+                help_y = Config.HEIGHT // 2 + 50  # Moved down to avoid overlap
+                if self.menu_panel is None:
+                    self.menu_panel = self.build_menu_panel(help_y)
+                self.mark(self.screen.blit(self.menu_panel, (0, help_y - 20)))
             
-            # Draw animated blocks falling in background
-            if random.random() < 0.02:
-                block = Block()
-                block.pos = [random.randint(0, Config.WIDTH - block.size), -block.size]
-                self.blocks.append(block)
+                # Animated block examples on top of the panel
+                block_x = Config.WIDTH // 4
+                power_up_x = Config.WIDTH * 3 // 4 - 50
+                spacing = 50
+                self.draw_legend_block(BlockType.NORMAL, None, block_x, help_y + spacing)
+                self.draw_legend_block(BlockType.HARMFUL, None, block_x, help_y + spacing * 2)
+                self.draw_legend_block(BlockType.BONUS, None, block_x, help_y + spacing * 3)
+                self.draw_legend_block(BlockType.POWER_UP, PowerUpType.SHIELD, power_up_x, help_y + spacing)
+                self.draw_legend_block(BlockType.POWER_UP, PowerUpType.SLOW_TIME, power_up_x, help_y + spacing * 2)
+                self.draw_legend_block(BlockType.POWER_UP, PowerUpType.MAGNET, power_up_x, help_y + spacing * 3)
             
-            for block in self.blocks[:]:
-                block.update(2)
-                block.draw(self.screen)
-                if block.pos[1] > Config.HEIGHT:
-                    self.blocks.remove(block)
+                # Draw animated blocks falling in background
+                self.particles.draw(self.screen, self.frame_rects)
+                for block in self.menu_blocks:
+                    self.mark(block.draw(self.screen, self.sprites, alpha))
                     
-        elif self.state == GameState.HIGH_SCORES:
-            self.draw_text("HIGH SCORES", self.big_font, Colors.GOLD, Config.WIDTH // 2, Config.HEIGHT // 4)
+            elif self.state == GameState.HIGH_SCORES:
+                self.draw_text("HIGH SCORES", self.big_font, Colors.GOLD, Config.WIDTH // 2, Config.HEIGHT // 4)
             
-            for i, score in enumerate(self.high_scores):
-                if score == 0:
-                    continue
+                for i, score in enumerate(self.high_scores):
+                    if score == 0:
+                        continue
                     
-                y_pos = Config.HEIGHT // 3 + 60 * i
-                rank_color = Colors.GOLD if i == 0 else Colors.OFF_WHITE
+                    y_pos = Config.HEIGHT // 3 + 60 * i
+                    rank_color = Colors.GOLD if i == 0 else Colors.OFF_WHITE
                 
-                self.draw_text(f"{i+1}. {score}", self.font, rank_color, Config.WIDTH // 2, y_pos)
+                    self.draw_text(f"{i+1}. {score}", self.font, rank_color, Config.WIDTH // 2, y_pos)
             
-            pulse = 0.7 + 0.3 * math.sin(self.menu_offset * 0.1)
-            option_color = tuple(int(c * pulse) for c in Colors.OFF_WHITE)
-            self.draw_text("Press SPACE to return", self.font, option_color, Config.WIDTH // 2, Config.HEIGHT * 3 // 4)
+                option_alpha = self.option_alpha()
+                self.draw_text("Press SPACE to return", self.font, Colors.OFF_WHITE, Config.WIDTH // 2, Config.HEIGHT * 3 // 4,
+                               option_alpha)
             
-        elif self.state == GameState.GAME_OVER:
-            self.draw_text("GAME OVER", self.big_font, Colors.CORAL, Config.WIDTH // 2, Config.HEIGHT // 3)
-            self.draw_text(f"Final Score: {self.score}", self.font, Colors.OFF_WHITE, Config.WIDTH // 2,
-                           Config.HEIGHT // 2)
+            elif self.state == GameState.GAME_OVER:
+                self.draw_text("GAME OVER", self.big_font, Colors.CORAL, Config.WIDTH // 2, Config.HEIGHT // 3)
+                self.draw_text(f"Final Score: {self.score}", self.font, Colors.OFF_WHITE, Config.WIDTH // 2,
+                               Config.HEIGHT // 2)
             
-            pulse = 0.7 + 0.3 * math.sin(self.menu_offset * 0.1)
-            option_color = tuple(int(c * pulse) for c in Colors.OFF_WHITE)
+                option_alpha = self.option_alpha()
             
-            self.draw_text("Press SPACE to restart", self.font, option_color, Config.WIDTH // 2,
-                           Config.HEIGHT * 2 // 3)
-            self.draw_text("Press H for high scores", self.font, option_color, Config.WIDTH // 2,
-                           Config.HEIGHT * 2 // 3 + 60)
+                self.draw_text("Press SPACE to restart", self.font, Colors.OFF_WHITE, Config.WIDTH // 2,
+                               Config.HEIGHT * 2 // 3, option_alpha)
+                self.draw_text("Press H for high scores", self.font, Colors.OFF_WHITE, Config.WIDTH // 2,
+                               Config.HEIGHT * 2 // 3 + 60, option_alpha)
                            
-        elif self.state == GameState.PAUSED:
-            # Semi-transparent overlay
-            overlay = pygame.Surface((Config.WIDTH, Config.HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 128))
-            self.screen.blit(overlay, (0, 0))
+            elif self.state == GameState.PAUSED:
+                # Semi-transparent overlay, built once per window size
+                if self.pause_overlay is None:
+                    self.pause_overlay = pygame.Surface((Config.WIDTH, Config.HEIGHT), pygame.SRCALPHA)
+                    self.pause_overlay.fill((0, 0, 0, 128))
+                    self.pause_overlay = prepare_surface(self.pause_overlay)
+                self.screen.blit(self.pause_overlay, (0, 0))
             
-            self.draw_text("PAUSED", self.big_font, Colors.MUSTARD, Config.WIDTH // 2, Config.HEIGHT // 3)
+                self.draw_text("PAUSED", self.big_font, Colors.MUSTARD, Config.WIDTH // 2, Config.HEIGHT // 3)
             
-            pulse = 0.7 + 0.3 * math.sin(self.menu_offset * 0.1)
-            option_color = tuple(int(c * pulse) for c in Colors.OFF_WHITE)
+                option_alpha = self.option_alpha()
             
-            self.draw_text("Press P to resume", self.font, option_color, Config.WIDTH // 2, Config.HEIGHT // 2)
-            self.draw_text("Press ESC for menu", self.font, option_color, Config.WIDTH // 2, Config.HEIGHT // 2 + 60)
+                self.draw_text("Press P to resume", self.font, Colors.OFF_WHITE, Config.WIDTH // 2, Config.HEIGHT // 2,
+                               option_alpha)
+                self.draw_text("Press ESC for menu", self.font, Colors.OFF_WHITE, Config.WIDTH // 2, Config.HEIGHT // 2 + 60,
+                               option_alpha)
 
         if self.state in (GameState.PLAYING, GameState.PAUSED):
-            # Draw global particles
-            for particle in self.particles:
-                particle.draw(self.screen)
+            # Draw particles
+            with profiler.section("draw.particles"):
+                self.particles.draw(self.screen, self.frame_rects)
             
-            # Create a temporary surface for applying screen shake
-            if self.shake_amount > 0:
-                temp_surface = pygame.Surface((Config.WIDTH, Config.HEIGHT), pygame.SRCALPHA)
-                
-                # Draw player and blocks to the temporary surface
-                self.player.draw(temp_surface)
-                for block in self.blocks:
-                    block.draw(temp_surface)
-                
-                # Blit with shake offset
-                self.screen.blit(temp_surface, shake_offset)
-            else:
-                # Draw directly to screen if no shake
-                self.player.draw(self.screen)
-                for block in self.blocks:
-                    block.draw(self.screen)
+            # Shaken frames draw the world onto its persistent layer
+            with profiler.section("draw.world"):
+                if self.shake_amount > 0:
+                    world = self.compositor.layer("world", self.screen.get_size())
+                    surface = world.begin()
+                    
+                    # Draw player and blocks to the world layer
+                    world.rects.append(self.player.draw(surface, self.sprites, alpha))
+                    self.draw_blocks(surface, alpha, world.rects)
+                    
+                    # Composite with shake offset
+                    for rect in world.composite(self.screen, shake_offset):
+                        self.mark(rect)
+                else:
+                    # Draw directly to screen if no shake
+                    self.mark(self.player.draw(self.screen, self.sprites, alpha))
+                    self.draw_blocks(self.screen, alpha, self.frame_rects)
             
             # Draw HUD
-            score_text = f"Score: {self.score}"
-            level_text = f"Level: {min(10, self.speed - 4)}"
-            
-            # Draw lives as hearts
-            heart_spacing = 40
-            heart_y = 30
-            for i in range(self.lives):
-                heart_x = Config.WIDTH - 50 - i * heart_spacing
-                
-                # Draw heart shape
-                heart_color = Colors.CORAL
-                if i == 0:  # Make the last heart pulse
-                    pulse = 0.8 + 0.2 * math.sin(self.menu_offset * 0.1)
-                    heart_color = tuple(int(c * pulse) for c in heart_color)
-                
-                # Draw a simple heart shape
-                heart_size = 15
-                pygame.draw.polygon(self.screen, heart_color, [
-                    (heart_x, heart_y + heart_size // 2),
-                    (heart_x - heart_size // 2, heart_y),
-                    (heart_x - heart_size, heart_y + heart_size // 2),
-                    (heart_x - heart_size // 2, heart_y + heart_size),
-                ])
-                pygame.draw.polygon(self.screen, heart_color, [
-                    (heart_x, heart_y + heart_size // 2),
-                    (heart_x + heart_size // 2, heart_y),
-                    (heart_x + heart_size, heart_y + heart_size // 2),
-                    (heart_x + heart_size // 2, heart_y + heart_size),
-                ])
-            
-            # HUD Background
-            hud_bg = pygame.Surface((200, 90), pygame.SRCALPHA)
-            hud_bg.fill((0, 0, 0, 128))
-            self.screen.blit(hud_bg, (Config.WIDTH - 220, 70))
-            
-            self.draw_text(score_text, self.font, Colors.MUSTARD, Config.WIDTH - 120, 80)
-            self.draw_text(level_text, self.font, Colors.MINT, Config.WIDTH - 120, 120)
-            
-            # Show active power-ups
-            power_up_x = 20
-            power_up_y = 20
-            power_text = ""
-            
-            if self.player.has_power(PowerUpType.SHIELD):
-                power_text += "SHIELD "
-                remaining = self.player.active_powers[PowerUpType.SHIELD] // Config.FPS
-                power_text += f"{remaining}s "
-            
-            if self.player.has_power(PowerUpType.SLOW_TIME):
-                power_text += "SLOW "
-                remaining = self.player.active_powers[PowerUpType.SLOW_TIME] // Config.FPS
-                power_text += f"{remaining}s "
-            
-            if self.player.has_power(PowerUpType.MAGNET):
-                power_text += "MAGNET "
-                remaining = self.player.active_powers[PowerUpType.MAGNET] // Config.FPS
-                power_text += f"{remaining}s "
-            
-            if power_text:
-                power_bg = pygame.Surface((len(power_text) * 10 + 20, 30), pygame.SRCALPHA)
-                power_bg.fill((0, 0, 0, 128))
-                self.screen.blit(power_bg, (power_up_x - 10, power_up_y - 5))
-                self.draw_text(power_text, self.small_font, Colors.LIGHT_BLUE, power_up_x + len(power_text) * 5, power_up_y)
-
+            with profiler.section("draw.hud"):
+                self.draw_hud()
+
+        with profiler.section("draw.profiler"):
+            self.mark(profiler.draw_overlay(self.screen))
+
+        with profiler.section("flip"):
+            if self.dirty is not None:
+                self.frame_rects = None
+            self.present(signature)
+
+    def present(self, signature=None):
+        rects = self.dirty.present(self.screen, signature) if self.dirty is not None else None
+        if self.viewport_surface is None:
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+            return
+        if rects is not None and not rects:
+            return
+        # Software fallback: one scale pass from the canvas to the window
+        if self.viewport.size == self.screen.get_size():
+            self.viewport_surface.blit(self.screen, (0, 0))
+        elif Config.CANVAS_FILTER == "nearest":
+            pygame.transform.scale(self.screen, self.viewport.size, self.viewport_surface)
+        else:
+            pygame.transform.smoothscale(self.screen, self.viewport.size, self.viewport_surface)
         pygame.display.flip()
 
-    def draw_text(self, text, font, color, x, y):
-        text_surface = font.render(text, True, color)
+    def build_menu_panel(self, help_y):
+        # Backdrops and text of the HOW TO PLAY panel, in panel coordinates.
+        # The panel spans the full width since the power-up labels overhang the backdrop
+        left, top = 0, help_y - 20
+        panel = pygame.Surface((Config.WIDTH, 300), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180), (100, 0, Config.WIDTH - 200, 300))  # Made taller and more opaque
+        
+        self.draw_text("HOW TO PLAY", self.font, Colors.MINT, Config.WIDTH // 2 - left, help_y - top, surface=panel)
+        
+        # Explanations next to the block examples
+        block_x = Config.WIDTH // 4
+        text_x = block_x + 180 - left
+        power_text_x = Config.WIDTH * 3 // 4 - 50 + 180 - left
+        spacing = 50  # Increased spacing
+        for row, (label, color, x) in enumerate((
+                ("Normal Block (+1 point)", Colors.TEAL, text_x),
+                ("Harmful Block (avoid or +2 points if dodged)", Colors.RED, text_x),
+                ("Bonus Block (+5 points)", Colors.GREEN, text_x),
+                ("Shield (blocks damage)", Colors.LIGHT_BLUE, power_text_x),
+                ("Slow Time (reduces block speed)", Colors.PURPLE, power_text_x),
+                ("Magnet (attracts bonus items)", Colors.MINT, power_text_x))):
+            y = help_y + spacing * (row % 3 + 1) + 10 - top
+            self.draw_text(label, self.small_font, color, x, y, surface=panel)
+        
+        # Controls
+        controls_y = help_y + spacing * 4 + 30  # Increased spacing
+        controls_bg = pygame.Surface((Config.WIDTH - 200, 50), pygame.SRCALPHA)
+        controls_bg.fill((0, 0, 0, 180))  # Made more opaque
+        panel.blit(controls_bg, (100, controls_y - 10 - top))
+        
+        self.draw_text("Controls: ← → arrows to move   |   P to pause   |   ESC for menu",
+                       self.small_font, Colors.OFF_WHITE, Config.WIDTH // 2 - left, controls_y - top, surface=panel)
+        return prepare_surface(panel)
+
+    def draw_legend_block(self, block_type, power_up_type, x, y):
+        # Legend icons spin and pulse in step with the menu animation
+        size = Config.BLOCK_SIZE
+        frame = self.sprites.block_frame(size, block_type, power_up_type, self.menu_offset,
+                                         self.menu_offset * math.pi / 30, 1.0)
+        self.mark(self.screen.blit(frame, (
+            x - size // 2 + (size - frame.get_width()) // 2,
+            y + (size - frame.get_height()) // 2
+        )))
+
+    def draw_blocks(self, surface, alpha=1.0, rects=None):
+        # Counterpart of Block.draw for the simulation's block store
+        blocks = self.sim.blocks
+        n = blocks.count
+        if n == 0:
+            return
+        visible = blocks.scale[:n] > 0
+        x = blocks.prev_x[:n] + (blocks.x[:n] - blocks.prev_x[:n]) * alpha
+        y = blocks.prev_y[:n] + (blocks.y[:n] - blocks.prev_y[:n]) * alpha
+        size = blocks.size
+        block_frame = self.sprites.block_frame
+        block_types, power_up_types = BlockStore.BLOCK_TYPES, BlockStore.POWER_UP_TYPES
+        for bx, by, block_type, power_up_type, angle, pulse, scale in zip(
+                x[visible].tolist(), y[visible].tolist(),
+                blocks.block_type[:n][visible].tolist(), blocks.power_up_type[:n][visible].tolist(),
+                blocks.angle[:n][visible].tolist(), blocks.pulse[:n][visible].tolist(),
+                blocks.scale[:n][visible].tolist()):
+            block_surface = block_frame(size, block_types[block_type], power_up_types[power_up_type],
+                                        angle, pulse, scale)
+            rect = surface.blit(block_surface, (
+                bx + (size - block_surface.get_width()) // 2,
+                by + (size - block_surface.get_height()) // 2
+            ))
+            if rects is not None:
+                rects.append(rect)
+
+    def draw_hud(self):
+        # The HUD is retained on its own layer and rebuilt only when what it
+        # shows changes; the pulsing heart is blitted on top from cached frames
+        power_text = ""
+        for power_up_type, label in ((PowerUpType.SHIELD, "SHIELD"), (PowerUpType.SLOW_TIME, "SLOW"),
+                                     (PowerUpType.MAGNET, "MAGNET")):
+            if self.player.has_power(power_up_type):
+                remaining = self.player.active_powers[power_up_type] // Config.TICK_RATE
+                power_text += f"{label} {remaining}s "
+        
+        hud = self.compositor.layer("hud", self.screen.get_size(), premultiplied=True)
+        key = (self.score, self.lives, min(10, self.speed - 4), power_text)
+        if key != self.hud_key or not hud.rects:
+            self.hud_key = key
+            self.build_hud(hud, power_text)
+        for rect in hud.composite(self.screen):
+            self.mark(rect)
+        
+        if self.lives > 0:  # Make the last heart pulse
+            level = self.heart_level()
+            heart = self.heart_frames.get(level)
+            if heart is None:
+                heart = self.heart_frames[level] = self.render_heart(
+                    tuple(int(c * level / Config.HUD_PULSE_LEVELS) for c in Colors.CORAL))
+            rect = self.screen.blit(heart, (Config.WIDTH - 50 - heart.get_width() // 2, 30))
+            self.mark(rect)
+            if self.frame_rects is not None:
+                # A repeated paused screen presents only what pulses
+                self.dirty.pulse_rects.append(rect)
+
+    def build_hud(self, hud, power_text):
+        surface = hud.begin()
+        
+        # Draw lives as hearts, all but the pulsing one
+        heart_spacing = 40
+        heart_y = 30
+        heart = self.render_heart(Colors.CORAL)
+        for i in range(1, self.lives):
+            heart_x = Config.WIDTH - 50 - i * heart_spacing
+            hud.rects.append(surface.blit(heart, (heart_x - heart.get_width() // 2, heart_y)))
+        
+        # HUD Background
+        hud.rects.append(surface.fill((0, 0, 0, 128), (Config.WIDTH - 220, 70, 200, 90)))
+        
+        def draw_text(text, font, color, x, y):
+            text_surface = premultiplied(self.text_cache.render(text, font, color))
+            text_rect = text_surface.get_rect(centerx=x, y=y)
+            hud.rects.append(surface.blit(text_surface, text_rect, special_flags=pygame.BLEND_PREMULTIPLIED))
+        
+        draw_text(f"Score: {self.score}", self.font, Colors.MUSTARD, Config.WIDTH - 120, 80)
+        draw_text(f"Level: {min(10, self.speed - 4)}", self.font, Colors.MINT, Config.WIDTH - 120, 120)
+        
+        # Show active power-ups
+        power_up_x = 20
+        power_up_y = 20
+        if power_text:
+            hud.rects.append(surface.fill((0, 0, 0, 128), (power_up_x - 10, power_up_y - 5,
+                                                           len(power_text) * 10 + 20, 30)))
+            draw_text(power_text, self.small_font, Colors.LIGHT_BLUE, power_up_x + len(power_text) * 5, power_up_y)
+
+    @staticmethod
+    def render_heart(color):
+        # Draw a simple heart shape
+        heart_size = 15
+        heart = pygame.Surface((heart_size * 2 + 1, heart_size + 1), pygame.SRCALPHA)
+        pygame.draw.polygon(heart, color, [
+            (heart_size, heart_size // 2),
+            (heart_size // 2, 0),
+            (0, heart_size // 2),
+            (heart_size // 2, heart_size),
+        ])
+        pygame.draw.polygon(heart, color, [
+            (heart_size, heart_size // 2),
+            (heart_size + heart_size // 2, 0),
+            (heart_size * 2, heart_size // 2),
+            (heart_size + heart_size // 2, heart_size),
+        ])
+        return prepare_surface(heart)
+
+    def draw_text(self, text, font, color, x, y, alpha=None, surface=None):
+        text_surface = self.text_cache.render(text, font, color, alpha=alpha)
         text_rect = text_surface.get_rect()
         text_rect.centerx = x
         text_rect.y = y
-        self.screen.blit(text_surface, text_rect)
+        if surface is not None:
+            return surface.blit(text_surface, text_rect)
+        rect = self.screen.blit(text_surface, text_rect)
+        if self.frame_rects is not None:
+            self.frame_rects.append(rect)
+            if alpha is not None:
+                self.dirty.pulse_rects.append(rect)
 
     async def run(self):
+        # Fixed-timestep loop: the simulation always advances in 1 / TICK_RATE steps,
+        # while frames are rendered as fast as Config.FPS allows and interpolated
+        # between the last two ticks.
+        tick = 1.0 / Config.TICK_RATE
+        accumulator = 0.0
+        previous = time.perf_counter()
         running = True
         while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(Config.FPS)
+            now = time.perf_counter()
+            accumulator += min(now - previous, Config.MAX_FRAME_TIME)
+            previous = now
+
+            with self.profiler.section("events"):
+                running = self.handle_events()
+
+            ticks = 0
+            while accumulator >= tick and ticks < Config.MAX_TICKS_PER_FRAME:
+                self.update()
+                accumulator -= tick
+                ticks += 1
+            if accumulator >= tick:
+                # Too far behind to catch up; drop the backlog instead of spiralling
+                accumulator %= tick
+
+            self.draw(accumulator / tick)
+            work = time.perf_counter() - now
+            with self.profiler.section("idle"):
+                self.clock.tick(Config.FPS)
+            if self.quality.frame(work, time.perf_counter() - now):
+                self.apply_quality()
+            self.profiler.end_frame()
             await asyncio.sleep(0)  # Required for web compatibility
 
         pygame.quit()
@@ -972,6 +3057,8 @@ async def main():
     except Exception as e:
         print(f"Game error: {e}")
         pygame.quit()
+    finally:
+        game.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+
+def verify(replay, score, lives):
+    if (score, lives) == (replay.score, replay.lives):
+        print(f"Verified: score {score}, lives {lives}")
+        return 0
+    print(f"MISMATCH: replayed score {score}, lives {lives}; recorded score {replay.score}, lives {replay.lives}")
+    return 1
+
+
+def fast_forward(main, replay):
+    # Rules only: no window, no rendering, no frame cap
+    sim = main.Simulation()
+    sim.resize(replay.width, replay.height)
+    sim.reset(replay.seed)
+    start = time.perf_counter()
+    for action, paused, size in replay.inputs():
+        if size is not None:
+            sim.resize(*size)
+        if not paused:
+            sim.step(action)
+    elapsed = time.perf_counter() - start
+    print(f"{replay.ticks} ticks in {elapsed:.3f} s ({replay.ticks / elapsed:.0f} ticks/s)")
+    return verify(replay, sim.score, sim.lives)
+
+
+def play(main, replay, speed=1.0, profile=None):
+    # One update and one draw per tick; throttled to speed x real time unless profiling
+    game = main.Game()
+    game.start_replay(replay)
+    tick_rate = 0 if profile else main.Config.TICK_RATE * speed
+    while game.state in (main.GameState.PLAYING, main.GameState.PAUSED):
+        if not game.handle_events():
+            break
+        game.update()
+        game.draw(1.0)
+        game.profiler.end_frame()
+        game.clock.tick(tick_rate)
+    game.close()
+    if profile:
+        game.profiler.export_csv(f"{profile}.csv")
+        game.profiler.export_json(f"{profile}.json")
+        print(f"Frame timings written to {profile}.csv and {profile}.json")
+    return verify(replay, game.score, game.lives)
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Play back a recorded Falling Blocks session")
+    parser.add_argument("path", help="replay file (.fbr)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--fast", action="store_true", help="run the rules only, as fast as possible")
+    mode.add_argument("--profile", metavar="PREFIX",
+                      help="render headlessly at full speed and export frame timings to PREFIX.csv/.json")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed when watching")
+    args = parser.parse_args(argv)
+
+    if args.fast or args.profile:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import main
+
+    replay = main.Replay.load(args.path)
+    print(f"Replay seed {replay.seed}, {replay.width}x{replay.height}, {replay.ticks} ticks, "
+          f"{len(replay.events)} input events, {os.path.getsize(args.path)} bytes")
+    if args.fast:
+        return fast_forward(main, replay)
+    return play(main, replay, args.speed, args.profile)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
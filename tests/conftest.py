@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Headless, and main.py importable from the repository root
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Config, Game
+
+
+@pytest.fixture
+def make_game(monkeypatch, tmp_path):
+    # Scores and replays are written to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "RECORD_REPLAYS", False)
+    # Resizing changes the playfield size for everything after
+    monkeypatch.setattr(Config, "WIDTH", Config.WIDTH)
+    monkeypatch.setattr(Config, "HEIGHT", Config.HEIGHT)
+    games = []
+
+    def make(**settings):
+        for key, value in settings.items():
+            monkeypatch.setattr(Config, key, value)
+        games.append(Game())
+        return games[-1]
+
+    yield make
+    for game in games:
+        game.close()
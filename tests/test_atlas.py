@@ -0,0 +1,69 @@
+import math
+
+import pygame
+import pytest
+
+import build_atlas
+from main import (QUALITY_LEVELS, Block, BlockType, Colors, Config, ParticleSpriteCache, Player, PowerUpType,
+                  SpriteAtlas, SpriteCache, prepare_surface)
+
+
+@pytest.fixture(scope="module")
+def atlas_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("atlas") / "sprite_atlas")
+    build_atlas.build(path)
+    return path
+
+
+def test_pages_are_inflated_only_when_drawn_from(atlas_path):
+    atlas = SpriteAtlas.load(atlas_path)
+    sprites = SpriteCache()
+    sprites.load_atlas(atlas)
+    particles = ParticleSpriteCache()
+    particles.load_atlas(atlas)
+    assert not atlas.images
+
+    frame = sprites.block_frame(50, BlockType.NORMAL, None, 30, 0.0, 1.0)
+    assert [atlas.pages[index][:2] for index in atlas.images] == [(SpriteAtlas.BLOCK, BlockType.NORMAL.value)]
+    assert pygame.image.tobytes(frame, "RGBA") == \
+        pygame.image.tobytes(prepare_surface(Block.render(50, BlockType.NORMAL, None, 30, 0.0, 1.0)), "RGBA")
+
+    frame = sprites.player_frame(50, 10, 0.0, Colors.CORAL, False)
+    assert len(atlas.images) == 2
+    assert pygame.image.tobytes(frame, "RGBA") == \
+        pygame.image.tobytes(prepare_surface(Player.render(50, 10, 0.0, Colors.CORAL, False)), "RGBA")
+    assert sprites.misses == 0
+
+    particles.get(0xFFD700, 3, 5)
+    assert len(atlas.images) == 3
+    assert particles.misses == 0
+
+
+def test_unreadable_pixels_fall_back_to_runtime_frames(atlas_path, tmp_path):
+    path = str(tmp_path / "sprite_atlas")
+    with open(atlas_path + ".idx", "rb") as f, open(path + ".idx", "wb") as out:
+        out.write(f.read())
+    with open(path + ".pix", "wb") as out:
+        out.write(b"not zlib")
+    sprites = SpriteCache()
+    sprites.load_atlas(SpriteAtlas.load(path))
+    frame = sprites.block_frame(50, BlockType.BONUS, None, 0, 0.0, 1.0)
+    assert sprites.misses == 1
+    assert pygame.image.tobytes(frame, "RGBA") == \
+        pygame.image.tobytes(prepare_surface(Block.render(50, BlockType.BONUS, None, 0, 0.0, 1.0)), "RGBA")
+
+
+@pytest.mark.parametrize("level", [level.name for level in QUALITY_LEVELS])
+def test_every_quality_level_draws_from_the_atlas(atlas_path, make_game, level):
+    game = make_game(SPRITE_ATLAS=atlas_path, QUALITY=level)
+    sprites = game.sprites
+    assert sprites.angle_step == (game.quality.current.angle_step or Config.SPRITE_ANGLE_STEP)
+    for angle in range(0, 360, 7):
+        pulse = angle * math.pi / 90
+        for block_type in BlockType:
+            power_up_types = list(PowerUpType) if block_type == BlockType.POWER_UP else [None]
+            for power_up_type in power_up_types:
+                sprites.block_frame(Config.BLOCK_SIZE, block_type, power_up_type, angle, pulse, 1.0)
+        for shielded in (False, True):
+            sprites.player_frame(Config.PLAYER_SIZE, angle, pulse, Colors.CORAL, shielded)
+    assert sprites.misses == 0
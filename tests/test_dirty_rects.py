@@ -0,0 +1,53 @@
+import pygame
+import pytest
+
+from main import Config, GameState
+
+
+@pytest.fixture
+def game(make_game):
+    return make_game(DIRTY_RECTS=True)
+
+
+def test_paused_screen_keeps_presenting_the_pulsing_heart(game):
+    game.state = GameState.PLAYING
+    game.draw()
+    game.state = GameState.PAUSED
+    pushed = []
+    present = game.dirty.present
+
+    def record(screen, signature=None):
+        rects = present(screen, signature)
+        pushed.append((game.heart_level(), rects))
+        return rects
+
+    game.dirty.present = record
+    for _ in range(120):
+        game.update()
+        game.draw()
+
+    heart = pygame.Rect(Config.WIDTH - 50 - 15, 30, 31, 16)
+    levels = [level for level, _ in pushed]
+    assert len(set(levels)) > 1
+    # Every presented change of heart brightness reaches the display
+    for (previous, _), (level, rects) in zip(pushed, pushed[1:]):
+        if level != previous:
+            assert any(rect.contains(heart) for rect in rects)
+
+
+def test_pause_overlay_is_built_once_per_window_size(game):
+    game.state = GameState.PAUSED
+    game.draw()
+    overlay = game.pause_overlay
+    game.update()
+    game.draw()
+    assert game.pause_overlay is overlay
+    game.resize(Config.MIN_WIDTH + 100, Config.MIN_HEIGHT + 100)
+    game.draw()
+    assert game.pause_overlay.get_size() == (Config.MIN_WIDTH + 100, Config.MIN_HEIGHT + 100)
+
+
+def test_presentation_stats_reach_the_profiler(game):
+    game.draw()
+    game.profiler.end_frame()
+    assert game.profiler.summary()["dirty_rects"]["frames"] == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from env import STOP, FallingBlocksEnv
+from main import BlockType, Config, PowerUpType
+
+
+@pytest.fixture
+def env(monkeypatch):
+    monkeypatch.setattr(Config, "WIDTH", 1000)
+    monkeypatch.setattr(Config, "HEIGHT", 800)
+    monkeypatch.setattr(Config, "BLOCK_SPAWN_RATE", 0)
+    env = FallingBlocksEnv(seed=1, observed_blocks=2)
+    env.reset(3)
+    player = env.sim.player
+    player.pos[:] = player.prev_pos[:] = (475, 700)  # Centre (500, 725)
+    player.velocity = 0
+    env.sim.blocks.clear()
+    return env
+
+
+def place(env, block_type, x, y):
+    return env.sim.blocks.append(x, y, block_type, None, 0, 0, 0)
+
+
+def test_observation_of_the_player_and_nearest_blocks(env):
+    sim = env.sim
+    sim.player.velocity = 5
+    sim.player.activate_power(PowerUpType.SHIELD, Config.SHIELD_DURATION // 2)
+    place(env, BlockType.BONUS, 275, 100)  # Farthest, left out
+    place(env, BlockType.NORMAL, 475, 500)
+    place(env, BlockType.HARMFUL, 575, 600)  # Nearest
+    collected = place(env, BlockType.NORMAL, 475, 690)
+    sim.blocks.active[collected] = False
+
+    obs = env.observe()
+    assert obs.dtype == np.float32 and obs.shape == (env.observation_size,)
+    assert obs[:7] == pytest.approx([0.5, 0.5, 0.6, 5 / 15, 0.5, 0, 0])
+    assert obs[7:].reshape(2, -1) == pytest.approx(np.array([
+        [0.1, 0.125, 0, 1, 0, 0, 1],
+        [0.0, 0.25, 1, 0, 0, 0, 1],
+    ]))
+
+
+def test_no_blocks_leave_the_block_rows_zero(env):
+    assert not env.observe()[7:].any()
+
+
+def test_reward_is_score_gained_plus_lives_changed(env):
+    place(env, BlockType.BONUS, 475, 690)
+    obs, reward, terminated, truncated, info = env.step(STOP)
+    assert (reward, terminated, info["score"]) == (5, False, 5)
+
+    place(env, BlockType.HARMFUL, 475, 690)
+    obs, reward, terminated, truncated, info = env.step(STOP)
+    assert (reward, terminated, info["lives"]) == (-10, False, Config.LIVES - 1)
+
+    env.sim.lives = 1
+    place(env, BlockType.HARMFUL, 475, 690)
+    obs, reward, terminated, truncated, info = env.step(STOP)
+    assert (reward, terminated, truncated) == (-10, True, False)
@@ -0,0 +1,54 @@
+import os
+
+import pygame
+
+from main import Action, Config, GameState, Replay
+
+
+def test_paused_frame_does_not_depend_on_interpolation(make_game):
+    game = make_game(DIRTY_RECTS=False)
+    game.state = GameState.PLAYING
+    for tick in range(120):
+        game.action = Action.RIGHT if tick < 60 else Action.LEFT
+        game.update()
+    assert game.sim.blocks.count
+    game.state = GameState.PAUSED
+    game.shake_amount = 0
+    frames = set()
+    for alpha in (0.0, 0.5, 0.99):
+        game.draw(alpha)
+        frames.add(pygame.image.tobytes(game.screen, "RGB"))
+    assert len(frames) == 1
+
+
+def test_recorded_game_replays_to_the_same_state(make_game):
+    game = make_game(DIRTY_RECTS=False, RECORD_REPLAYS=True)
+    game.reset_game(42)
+    game.state = GameState.PLAYING
+    actions = (Action.LEFT, Action.STOP, Action.RIGHT)
+    tick = 0
+    while game.state in (GameState.PLAYING, GameState.PAUSED) and tick < 20000:
+        if tick == 150:
+            game.state = GameState.PAUSED
+        elif tick == 200:
+            game.state = GameState.PLAYING
+        elif tick == 300:
+            game.resize(Config.WIDTH + 120, Config.HEIGHT - 80)
+        game.action = actions[tick // 45 % 3]
+        game.update()
+        tick += 1
+    assert game.sim.game_over
+    game.persistence.flush()
+    recorded = game.sim.snapshot()
+
+    (name,) = os.listdir(Config.REPLAY_DIR)
+    replay = Replay.load(os.path.join(Config.REPLAY_DIR, name))
+    codes = [code for _, code, _ in replay.events]
+    assert Replay.PAUSE in codes and Replay.RESUME in codes and Replay.RESIZE in codes
+    assert (replay.score, replay.lives) == (game.score, game.lives)
+
+    viewer = make_game(DIRTY_RECTS=False)
+    viewer.start_replay(replay)
+    while viewer.state in (GameState.PLAYING, GameState.PAUSED):
+        viewer.update()
+    assert viewer.sim.snapshot() == recorded
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import highscores
+from highscores import RECORD, HighScoreStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "high_scores")
+
+
+def store(path, compact_every=256):
+    return HighScoreStore(path, path + ".txt", compact_every)
+
+
+def test_log_is_replayed_and_a_torn_last_record_dropped(path):
+    scores = store(path)
+    for score in (30, 10, 20):
+        scores.add(score, "ann")
+    scores.flush()
+    # A crash in the middle of appending the next record
+    with open(path + ".log", "ab") as f:
+        f.write(b"\x07" * (RECORD.size // 2))
+
+    reopened = store(path)
+    assert reopened.top_scores(10) == [30, 20, 10]
+    assert reopened.top(1)[0]["name"] == "ann"
+    assert os.path.getsize(path + ".log") == 3 * RECORD.size
+    reopened.add(25)
+    reopened.flush()
+    assert store(path).top_scores(10) == [30, 25, 20, 10]
+
+
+def test_runs_already_in_the_snapshot_are_not_counted_twice(path):
+    scores = store(path)
+    for score in (5, 15):
+        scores.add(score)
+    scores.flush()
+    with open(path + ".log", "rb") as f:
+        log = f.read()
+    scores.compact(scores.records, scores.last_seq)
+    # A crash after the snapshot was swapped in but before the log was reset
+    with open(path + ".log", "wb") as f:
+        f.write(log)
+    assert store(path).top_scores(10) == [15, 5]
+
+
+def test_old_scores_file_is_migrated_once(path):
+    with open(path + ".txt", "w") as f:
+        f.write("50,120,0,7,0")
+    scores = store(path)
+    assert scores.top_scores(10) == [120, 50, 7]
+    assert os.path.exists(path + ".dat")
+
+    with open(path + ".txt", "w") as f:
+        f.write("999,0,0,0,0")
+    assert store(path).top_scores(10) == [120, 50, 7]
+
+
+def test_compaction_swaps_the_snapshot_in_whole(path, monkeypatch):
+    scores = store(path, compact_every=2)
+    for score in (1, 2):
+        scores.add(score)
+    scores.flush()
+    assert os.path.getsize(path + ".log") == 0
+    assert not os.path.exists(path + ".dat.tmp")
+    assert store(path).top_scores(10) == [2, 1]
+
+    # The next snapshot is written but never renamed over the old one
+    def crash(source, target):
+        raise OSError("crashed before the rename")
+
+    monkeypatch.setattr(highscores.os, "replace", crash)
+    for score in (3, 4):
+        scores.add(score)
+    scores.flush()
+    monkeypatch.undo()
+    assert os.path.exists(path + ".dat.tmp")
+    # The old snapshot is intact and the log still holds the newer runs
+    assert store(path).top_scores(10) == [4, 3, 2, 1]
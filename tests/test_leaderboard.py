@@ -0,0 +1,141 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from leaderboard import INT64_MAX, ConnectionPool, LeaderboardClient, LeaderboardError, LeaderboardServer
+
+
+def run(score=10, **fields):
+    return {"id": fields.pop("id", f"run-{score}"), "score": score, **fields}
+
+
+def test_validate_clamps_to_the_table_range():
+    row = LeaderboardServer.validate(run(1 << 70, seed=1 << 64))
+    assert row[1] == INT64_MAX
+    assert row[3] == INT64_MAX
+    assert LeaderboardServer.validate(run(-5, seed=-(1 << 70)))[1:4:2] == (0, -(1 << 63))
+
+
+@pytest.mark.parametrize("fields", [{"score": float("inf")}, {"time": float("nan")}, {"seed": float("-inf")}])
+def test_validate_refuses_unstorable_runs(fields):
+    with pytest.raises(ValueError):
+        LeaderboardServer.validate({**run(), **fields})
+
+
+def test_write_loop_fails_only_the_bad_batch_and_keeps_going():
+    server = LeaderboardServer(":memory:")
+    store = server.store
+
+    def failing_store(batches):
+        if any(row[0] == "bad" for runs in batches for row in runs):
+            raise RuntimeError("store failed")
+        return store(batches)
+
+    server.store = failing_store
+
+    async def submit(*runs):
+        return await server.dispatch({"op": "submit", "runs": list(runs)})
+
+    async def scenario():
+        writer = asyncio.create_task(server.write_loop())
+        try:
+            results = await asyncio.gather(submit(run(5)), submit(run(id="bad")), submit(run(7)),
+                                           return_exceptions=True)
+            after = await submit(run(9))
+        finally:
+            writer.cancel()
+        return results, after
+
+    (first, bad, third), after = asyncio.run(scenario())
+    assert first == {"ok": True, "ranks": [1]}
+    assert isinstance(bad, RuntimeError)
+    assert third == {"ok": True, "ranks": [1]}
+    assert after == {"ok": True, "ranks": [1]}
+    assert [entry["score"] for entry in server.top(10)] == [9, 7, 5]
+
+
+class Worker:
+    def submit(self, name, job):
+        job()
+
+
+class Pool:
+    def __init__(self, error):
+        self.error = error
+        self.requests = 0
+        self.opened = 0
+
+    def request(self, message):
+        self.requests += 1
+        raise self.error
+
+
+def client(error):
+    leaderboard = LeaderboardClient("127.0.0.1", 0, Worker())
+    leaderboard.pool = Pool(error)
+    return leaderboard
+
+
+def test_refused_batch_is_set_aside_not_retried():
+    leaderboard = client(LeaderboardError("bad run"))
+    leaderboard.submit(10)
+    leaderboard.poll()
+    stats = leaderboard.stats()
+    assert leaderboard.pool.requests == 1
+    assert (stats["queued"], stats["rejected"], stats["failures"], stats["backoff_s"]) == (0, 1, 0, 0.0)
+
+
+def test_unreachable_server_keeps_the_batch_and_backs_off():
+    leaderboard = client(ConnectionRefusedError())
+    leaderboard.submit(10)
+    leaderboard.poll()
+    stats = leaderboard.stats()
+    assert leaderboard.pool.requests == 1
+    assert (stats["queued"], stats["rejected"], stats["failures"], stats["backoff_s"]) == (1, 0, 1, 1.0)
+
+
+@pytest.fixture
+def reply():
+    # A server that answers every request line with the given line
+    server = socket.create_server(("127.0.0.1", 0))
+    answer = []
+
+    def serve():
+        while True:
+            try:
+                sock, _ = server.accept()
+            except OSError:
+                return
+            with sock, sock.makefile("rwb") as file:
+                while file.readline():
+                    file.write(answer[0])
+                    file.flush()
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    def set_reply(line):
+        answer[:] = [line]
+        return server.getsockname()[1]
+
+    yield set_reply
+    server.close()
+
+
+def test_error_reply_is_a_refusal(reply):
+    pool = ConnectionPool("127.0.0.1", reply(b'{"error": "bad run"}\n'))
+    with pytest.raises(LeaderboardError):
+        pool.request({"op": "top", "n": 1})
+    assert len(pool.idle) == 1
+    pool.close()
+
+
+@pytest.mark.parametrize("line", [b"{not json\n", b"[1, 2]\n"])
+def test_garbled_reply_is_retried_not_refused(reply, line):
+    leaderboard = LeaderboardClient("127.0.0.1", reply(line), Worker())
+    leaderboard.submit(10)
+    stats = leaderboard.stats()
+    assert (stats["queued"], stats["rejected"], stats["failures"]) == (1, 0, 1)
+    # The connection is not handed back for the next request
+    assert leaderboard.pool.idle == []
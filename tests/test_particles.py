@@ -0,0 +1,25 @@
+import numpy as np
+
+from main import ParticleSystem
+
+
+def test_expired_particles_are_compacted_out_in_order():
+    particles = ParticleSystem(capacity=4)
+    lives = [3, 1, 4, 1, 5, 2, 6, 2, 3, 1]
+    # More than the capacity, so the pool grows on the way
+    for i, life in enumerate(lives[:5]):
+        particles.emit(i, 0, (i, 0, 0), velocity_x=1, size=life, life=life)
+    particles.emit_many(np.arange(5, 10), 0, np.array([(i, 0, 0) for i in range(5, 10)]),
+                        np.ones(5), 0, lives[5:], lives[5:])
+    assert particles.count == len(lives) and particles.grows
+
+    for tick in range(1, max(lives) + 1):
+        particles.update()
+        n = particles.count
+        alive = [i for i, life in enumerate(lives) if life > tick]
+        # Survivors keep every column together and their order of emission
+        assert particles.color[:n, 0].tolist() == alive
+        assert particles.x[:n].tolist() == [i + tick for i in alive]
+        assert particles.life[:n].tolist() == [lives[i] - tick for i in alive]
+        assert particles.max_life[:n].tolist() == [lives[i] for i in alive]
+    assert particles.count == 0
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from main import PersistenceWorker
+
+
+def test_waiting_jobs_under_one_key_coalesce():
+    worker = PersistenceWorker(threaded=True)
+    started, release = threading.Event(), threading.Event()
+    written = []
+
+    def blocking():
+        started.set()
+        release.wait()
+        written.append("replay")
+
+    worker.submit("replay", blocking)
+    started.wait()
+    for score in (10, 20, 30):
+        worker.submit("scores", lambda score=score: written.append(score))
+    assert worker.stats()["pending"] == 1
+    release.set()
+    worker.flush()
+    assert written == ["replay", 30]
+    stats = worker.stats()
+    assert (stats["submitted"], stats["coalesced"], stats["completed"], stats["pending"]) == (4, 2, 2, 0)
+
+
+def test_flush_waits_for_every_queued_job_and_failures_do_not_stop_it():
+    worker = PersistenceWorker(threaded=True)
+    written = []
+
+    def failing():
+        raise OSError("disk full")
+
+    worker.submit("a", failing)
+    for key in "bcd":
+        worker.submit(key, lambda key=key: written.append(key))
+    worker.flush()
+    assert written == ["b", "c", "d"]
+    stats = worker.stats()
+    assert (stats["completed"], stats["failed"], stats["last_error"]) == (4, 1, "a: disk full")
+
+
+def test_flush_writes_now_without_threads():
+    worker = PersistenceWorker(threaded=False)
+    written = []
+
+    async def scenario():
+        # Jobs wait for the event loop until flush() writes them in place
+        for key in "ab":
+            worker.submit(key, lambda key=key: written.append(key))
+        assert written == []
+        worker.flush()
+        assert written == ["a", "b"]
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert worker.stats()["completed"] == 2
@@ -0,0 +1,55 @@
+import json
+
+import pygame
+import pytest
+
+import main
+from main import FrameProfiler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # perf_counter advanced by hand, in milliseconds
+    now = [0.0]
+    monkeypatch.setattr(main.time, "perf_counter", lambda: now[0] / 1000)
+    return now
+
+
+def test_percentiles_cover_the_last_window_of_frames(clock, tmp_path):
+    profiler = FrameProfiler(window=4)
+    profiler.add_stats("cache", lambda: {"hits": 3})
+    for i in range(1, 7):
+        profiler.section("update").total = i / 1000
+        clock[0] += 10 * i
+        profiler.end_frame()
+
+    summary = profiler.summary()
+    assert summary["frames"] == 4
+    assert summary["frame"] == pytest.approx({"mean": 45.0, "p50": 45.0, "p95": 58.5, "p99": 59.7})
+    assert summary["sections"]["update"] == pytest.approx({"mean": 4.5, "p50": 4.5, "p95": 5.85, "p99": 5.97})
+    assert summary["cache"] == {"hits": 3}
+
+    profiler.export_csv(tmp_path / "profile.csv")
+    lines = (tmp_path / "profile.csv").read_text().splitlines()
+    assert lines[0] == "frame_ms,update_ms"
+    # Oldest first, after the ring has wrapped
+    assert [[float(value) for value in line.split(",")] for line in lines[1:]] == \
+        [[30, 3], [40, 4], [50, 5], [60, 6]]
+
+
+def test_f4_exports_the_summary_and_registered_stats(make_game):
+    game = make_game(DIRTY_RECTS=False, PROFILER=True)
+    for _ in range(3):
+        game.update()
+        game.draw()
+        game.profiler.end_frame()
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_F4, mod=0, unicode="", scancode=0))
+    assert game.handle_events()
+
+    with open("profile.json") as f:
+        exported = json.load(f)
+    assert exported["frames"] == 3
+    assert {"persistence", "quality", "particle_sprites", "sprites", "text_cache",
+            "blocks", "block_pool", "particles", "compositor"} <= exported.keys()
+    with open("profile.csv") as f:
+        assert len(f.read().splitlines()) == 4
@@ -0,0 +1,59 @@
+import pytest
+
+from main import QUALITY_LEVELS, Config, QualityGovernor
+
+
+def window(governor, ms):
+    # One decision window of equal frames; returns whether the level changed
+    changed = [governor.frame(ms / 1000, 1 / 60) for _ in range(governor.window)]
+    assert not any(changed[:-1])
+    return changed[-1]
+
+
+def test_steps_down_over_budget_and_up_only_after_sustained_headroom():
+    governor = QualityGovernor(target_ms=10, window=4, upgrade_windows=2)
+    assert governor.current.name == "high"
+    assert window(governor, 12)
+    assert window(governor, 12)
+    assert governor.current.name == "low"
+    assert not window(governor, 12)
+
+    # Between half the budget and the budget holds the level and resets the count
+    assert not window(governor, 3)
+    assert not window(governor, 7)
+    assert not window(governor, 3)
+    assert window(governor, 3)
+    assert governor.current.name == "medium"
+
+    # A step up undone by the very next window makes the next one wait longer
+    assert window(governor, 12)
+    assert governor.current.name == "low"
+    assert governor.stats()["upgrade_windows"] == 4
+    for _ in range(3):
+        assert not window(governor, 3)
+    assert window(governor, 3)
+    assert governor.current.name == "medium"
+    assert [change["reason"] for change in governor.stats()["recent_changes"]] == \
+        ["over budget", "over budget", "headroom", "over budget", "headroom"]
+
+
+def test_manual_level_holds_until_auto():
+    governor = QualityGovernor(target_ms=10, window=4, upgrade_windows=1, override="medium")
+    assert not window(governor, 50)
+    assert governor.current.name == "medium"
+    governor.cycle_override()
+    assert governor.mode == "high"
+    governor.cycle_override()
+    assert governor.mode == "auto"
+    assert window(governor, 50)
+    assert governor.current.name == "medium"
+
+
+@pytest.mark.parametrize("level", QUALITY_LEVELS, ids=lambda level: level.name)
+def test_each_level_is_applied_to_the_effects(make_game, level):
+    game = make_game(DIRTY_RECTS=False, QUALITY=level.name)
+    assert game.effects_scale == level.particles
+    assert game.trail_chance == level.trail
+    assert game.sprites.glow_rings == level.glow_rings
+    assert game.sprites.angle_step == (level.angle_step or Config.SPRITE_ANGLE_STEP)
+    assert game.starfield.visible_layers == level.star_layers
@@ -0,0 +1,30 @@
+import pytest
+
+from main import Action, Config, PowerUpType, Simulation
+
+
+@pytest.fixture
+def config():
+    saved = {key: getattr(Config, key) for key in ("MAX_BLOCKS", "BLOCK_SPAWN_RATE", "SIM_VECTOR_MIN_BLOCKS")}
+    yield Config
+    for key, value in saved.items():
+        setattr(Config, key, value)
+
+
+@pytest.mark.parametrize("max_blocks, spawn_rate", [(15, 0.1), (40, 0.5)])
+def test_scalar_and_vector_block_updates_match(config, max_blocks, spawn_rate):
+    config.MAX_BLOCKS, config.BLOCK_SPAWN_RATE = max_blocks, spawn_rate
+    actions = (Action.LEFT, Action.STOP, Action.RIGHT)
+    scalar, vector = Simulation(), Simulation()
+    scalar.reset(7)
+    vector.reset(7)
+    for tick in range(5000):
+        for sim, vector_min_blocks in ((scalar, 1 << 30), (vector, 0)):
+            config.SIM_VECTOR_MIN_BLOCKS = vector_min_blocks
+            # Stay alive, with the magnet on for part of the time
+            sim.lives = Config.LIVES
+            if tick % 500 < 300:
+                sim.player.activate_power(PowerUpType.MAGNET, 2)
+            sim.step(actions[tick // 30 % 3])
+        assert scalar.events == vector.events
+        assert scalar.snapshot() == vector.snapshot()
@@ -0,0 +1,54 @@
+from main import Action, Config, Simulation
+
+
+def play(sim, ticks):
+    actions = (Action.LEFT, Action.STOP, Action.RIGHT)
+    for tick in range(ticks):
+        sim.step(actions[tick // 20 % 3])
+
+
+def header(sim):
+    return Simulation.STATE.unpack_from(sim.snapshot())
+
+
+def test_restore_reproduces_every_header_field():
+    sim = Simulation()
+    sim.reset(1234)
+    play(sim, 500)
+    sim.player.velocity = -10
+    # gauss() draws two values and keeps the second pending in the RNG state
+    sim.rng.gauss(0, 1)
+    pending = sim.rng.getstate()[2]
+    assert pending is not None
+
+    clone = sim.clone()
+    original, restored = header(sim), header(clone)
+    assert restored == original
+    assert [type(value) for value in restored] == [type(value) for value in original]
+    assert clone.rng.getstate() == sim.rng.getstate()
+    assert clone.rng.getstate()[2] == pending
+
+    assert type(clone.speed) is int and clone.speed == sim.speed
+    assert clone.slow_mo_factor == sim.slow_mo_factor
+    assert clone.magnet_enabled is sim.magnet_enabled
+    assert clone.game_over is sim.game_over
+    assert (clone.score, clone.lives, clone.ticks, clone.seed) == (sim.score, sim.lives, sim.ticks, sim.seed)
+    assert clone.player.pos == sim.player.pos
+    assert clone.player.prev_pos == sim.player.prev_pos
+    assert (clone.player.velocity, clone.player.angle, clone.player.pulse) == \
+        (sim.player.velocity, sim.player.angle, sim.player.pulse)
+    assert clone.player.active_powers == sim.player.active_powers
+    assert (Config.WIDTH, Config.HEIGHT) == (original[0], original[1])
+
+
+def test_clone_stays_in_step_after_gauss():
+    sim = Simulation()
+    sim.reset(99)
+    play(sim, 200)
+    sim.rng.gauss(0, 1)
+    clone = sim.clone()
+    assert clone.rng.gauss(0, 1) == sim.rng.gauss(0, 1)
+    play(sim, 1000)
+    play(clone, 1000)
+    assert clone.snapshot() == sim.snapshot()
+